@@ -0,0 +1,57 @@
+# -----------------------------------------------------------
+# Mikrobenchmark výběru obslužné metody instrukce
+#
+# Porovnává původní výběr instrukce pomocí match/case nad řetězcem
+# operačního kódu s tabulkou obslužných metod indexovanou hodnotou
+# Opcode. Obslužné metody nic nedělají, měří se jen cena výběru.
+#
+# použití: python3 benchmarks/dispatch.py [--number N]
+# -----------------------------------------------------------
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from interpret import OPCODE_REQUIREMENTS, Opcode  # noqa: E402
+
+
+# Prázdná obslužná metoda
+def noop():
+    pass
+
+
+# Vytvoří funkci s původním žebříčkem match/case, porovnání řetězců probíhá
+# ve stejném pořadí jako v OPCODE_REQUIREMENTS
+def build_match_switch():
+    lines = ["def switch(instruction):", "    match instruction.upper():"]
+    for opcode in OPCODE_REQUIREMENTS:
+        lines.append("        case \"" + opcode + "\":")
+        lines.append("            noop()")
+    namespace = {"noop": noop}
+    exec("\n".join(lines), namespace)
+    return namespace["switch"]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--number", type=int, default=200000)
+    args = arg_parser.parse_args()
+
+    switch = build_match_switch()
+    dispatch_table = [noop for _ in OPCODE_REQUIREMENTS]
+
+    print("%-12s %12s %12s %8s" % ("opcode", "match [ns]", "table [ns]", "speedup"))
+    for name in OPCODE_REQUIREMENTS:
+        opcode = Opcode[name]
+        match_time = min(timeit.repeat(lambda: switch(name), number=args.number, repeat=3))
+        table_time = min(timeit.repeat(lambda: dispatch_table[opcode](), number=args.number, repeat=3))
+        match_ns = match_time / args.number * 1e9
+        table_ns = table_time / args.number * 1e9
+        print("%-12s %12.1f %12.1f %7.2fx" % (name, match_ns, table_ns, match_ns / table_ns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# -----------------------------------------------------------
+# Spouštěč benchmarků interpretu
+#
+# Pro každou zátěž z workloads.py vygeneruje program, jednou jej
+# spustí se --stats --insts pro zjištění počtu vykonaných instrukcí
+# a poté jej po zahřívacích bězích opakovaně měří, každý běh ve
+# vlastním procesu. Vypisuje rychlost v instrukcích za sekundu, dobu
+# načtení programu a maximální RSS procesu jako medián a 90. percentil.
+# Výsledky lze uložit jako základ a porovnávat s ním, zhoršení o více
+# než --threshold je označeno a skript pak končí kódem 1.
+#
+# použití: python3 benchmarks/run.py [--repeat N] [--warmup N] [--scale S]
+#          [--only NAME]... [--interpret-arg ARG]... [--baseline PATH]
+#          [--save-baseline PATH] [--threshold T]
+# -----------------------------------------------------------
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+from workloads import WORKLOADS  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+# Nejmenší zhoršení doby načtení v ms, které se ještě hlásí jako regrese
+LOAD_MIN_DELTA_MS = 5.0
+
+
+# Změří jeden běh interpretu v tomto procesu, volá se v podřízeném procesu
+# s parametrem --measure, výsledek zapíše jako JSON do souboru result_path
+def measure(result_path, interpret_args):
+    import interpret
+
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+    sys.argv = ["interpret.py"] + interpret_args
+    program = interpret.Interpret()
+    exit_code = 0
+    load_end = None
+    start = time.perf_counter()
+    try:
+        program.arguments_validator.get_arguments()
+        load_end = time.perf_counter()
+        program.iterator()
+    except SystemExit as error:
+        exit_code = error.code
+    finally:
+        program.output_sink.flush()
+    end = time.perf_counter()
+    if load_end is None:
+        load_end = end
+    with open(result_path, "w") as result_file:
+        json.dump({"load_s": load_end - start, "run_s": end - load_end, "exit": exit_code}, result_file)
+
+
+# Spustí měření v novém procesu a vrátí výsledek doplněný o maximální RSS v KB
+def run_once(interpret_args):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as result_file:
+        result_path = result_file.name
+    try:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--measure", result_path, "--"] +
+                                   interpret_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        with open(result_path) as result_file:
+            result = json.load(result_file)
+    finally:
+        os.remove(result_path)
+    result["rss_kb"] = usage.ru_maxrss
+    return result
+
+
+# Vrátí percentil seřazených hodnot metodou nejbližšího pořadí
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Spustí program jednou se statistikou --insts a vrátí počet vykonaných instrukcí
+def count_instructions(interpret_args, work_dir):
+    stats_path = os.path.join(work_dir, "stats.txt")
+    subprocess.run([sys.executable, os.path.join(BENCHMARKS_DIR, "..", "interpret.py")] + interpret_args +
+                   ["--stats=" + stats_path, "--insts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with open(stats_path) as stats_file:
+            return int(stats_file.read())
+    except (OSError, ValueError):
+        return 0
+
+
+# Změří jednu zátěž a vrátí souhrn
+def bench_workload(name, args, work_dir):
+    source, input_data = WORKLOADS[name](args.scale)
+    source_path = os.path.join(work_dir, name + ".xml")
+    input_path = os.path.join(work_dir, name + ".in")
+    with open(source_path, "w") as source_file:
+        source_file.write(source)
+    with open(input_path, "w") as input_file:
+        input_file.write(input_data or "")
+    interpret_args = ["--source=" + source_path, "--input=" + input_path] + args.interpret_arg
+
+    instructions = count_instructions(interpret_args, work_dir)
+    for _ in range(args.warmup):
+        run_once(interpret_args)
+    runs = [run_once(interpret_args) for _ in range(args.repeat)]
+    if any(run["exit"] != 0 for run in runs):
+        sys.stderr.write(name + ": interpret skončil kódem " + str(runs[0]["exit"]) + "\n")
+
+    # p90 rychlosti odpovídá 90. percentilu doby běhu, tedy pomalejším během
+    speeds = [instructions / run["run_s"] if run["run_s"] > 0 else 0 for run in runs]
+    loads = [run["load_s"] * 1000 for run in runs]
+    rss = [run["rss_kb"] for run in runs]
+    return {
+        "instructions": instructions,
+        "instructions_per_second": {"p50": percentile(speeds, 0.5), "p90": percentile(speeds, 0.1)},
+        "load_ms": {"p50": percentile(loads, 0.5), "p90": percentile(loads, 0.9)},
+        "peak_rss_kb": {"p50": percentile(rss, 0.5), "p90": percentile(rss, 0.9)},
+    }
+
+
+# Vrátí seznam zhoršení oproti základu, rychlost se porovnává směrem dolů,
+# doba načtení a paměť směrem nahoru; u doby načtení se navíc vyžaduje
+# absolutní rozdíl LOAD_MIN_DELTA_MS, jinak by u malých programů
+# (jednotky milisekund) hlásil regresi pouhý šum měření
+def regressions(result, base, threshold):
+    found = []
+    if base["instructions"] > 0 and result["instructions"] > 0 and \
+            result["instructions_per_second"]["p50"] < base["instructions_per_second"]["p50"] * (1 - threshold):
+        found.append("instr/s")
+    if result["load_ms"]["p50"] > base["load_ms"]["p50"] * (1 + threshold) and \
+            result["load_ms"]["p50"] - base["load_ms"]["p50"] > LOAD_MIN_DELTA_MS:
+        found.append("load")
+    if result["peak_rss_kb"]["p50"] > base["peak_rss_kb"]["p50"] * (1 + threshold):
+        found.append("rss")
+    return found
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[4:])
+        return
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--warmup", type=int, default=1)
+    arg_parser.add_argument("--scale", type=float, default=1.0)
+    arg_parser.add_argument("--only", action="append", choices=list(WORKLOADS))
+    arg_parser.add_argument("--interpret-arg", action="append", default=[])
+    arg_parser.add_argument("--baseline", type=str)
+    arg_parser.add_argument("--save-baseline", type=str)
+    arg_parser.add_argument("--threshold", type=float, default=0.1)
+    args = arg_parser.parse_args()
+    if args.repeat < 1:
+        arg_parser.error("--repeat must be at least 1")
+
+    baseline = None
+    baseline_path = args.baseline
+    if baseline_path is None and os.path.exists(DEFAULT_BASELINE):
+        baseline_path = DEFAULT_BASELINE
+    if baseline_path is not None:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("scale") != args.scale or baseline.get("interpret_args") != args.interpret_arg:
+            sys.stderr.write("základ byl změřen s jiným --scale nebo --interpret-arg, porovnání se vynechá\n")
+            baseline = None
+
+    print("%-18s %10s %12s %12s %10s %10s %10s %s" % ("workload", "insts", "instr/s p50", "instr/s p90",
+                                                      "load p50", "load p90", "rss MB", "regression"))
+    results = {}
+    regressed = False
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.only or list(WORKLOADS):
+            result = bench_workload(name, args, work_dir)
+            results[name] = result
+            found = []
+            if baseline is not None and name in baseline["workloads"]:
+                found = regressions(result, baseline["workloads"][name], args.threshold)
+            regressed = regressed or len(found) > 0
+            print("%-18s %10d %12.0f %12.0f %8.1fms %8.1fms %10.1f %s" % (
+                name, result["instructions"], result["instructions_per_second"]["p50"],
+                result["instructions_per_second"]["p90"], result["load_ms"]["p50"], result["load_ms"]["p90"],
+                result["peak_rss_kb"]["p50"] / 1024, ",".join(found)))
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump({"scale": args.scale, "interpret_args": args.interpret_arg, "workloads": results},
+                      baseline_file, indent=1)
+            baseline_file.write("\n")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
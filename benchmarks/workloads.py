@@ -0,0 +1,199 @@
+# -----------------------------------------------------------
+# Generované programy pro benchmarky
+#
+# Každá zátěž je funkce, která pro zadané měřítko vrátí xml programu
+# IPPcode23 a obsah vstupu pro instrukci READ (nebo None). Měřítko
+# 1.0 odpovídá velikosti, při které jeden běh trvá zhruba sekundu.
+# -----------------------------------------------------------
+
+import xml.etree.ElementTree as ET
+
+
+# -----------------------------------------------------------
+# ProgramBuilder
+#
+# Skládá instrukce do xml dokumentu, operandy se zadávají ve tvaru
+# "typ@hodnota" stejně jako v textovém zápisu IPPcode23
+# -----------------------------------------------------------
+class ProgramBuilder:
+    def __init__(self):
+        self.program = ET.Element("program", language="IPPcode23")
+        self.order = 0
+
+    # Přidá instrukci s operandy
+    def add(self, opcode, *operands):
+        self.order += 1
+        instruction = ET.SubElement(self.program, "instruction", order=str(self.order), opcode=opcode)
+        for i, operand in enumerate(operands):
+            a_type, value = operand.split("@", 1)
+            if a_type in ["GF", "LF", "TF"]:
+                a_type, value = "var", operand
+            elif a_type in ["label", "type"]:
+                value = operand.split("@", 1)[1]
+            argument = ET.SubElement(instruction, "arg" + str(i + 1), type=a_type)
+            argument.text = value
+
+    # Vrátí xml dokumentu
+    def to_xml(self):
+        return ET.tostring(self.program, encoding="unicode", xml_declaration=True)
+
+
+# Těsná celočíselná smyčka s aritmetikou a podmíněným skokem
+def int_loop(scale):
+    iterations = max(1, int(50000 * scale))
+    builder = ProgramBuilder()
+    builder.add("DEFVAR", "GF@i")
+    builder.add("DEFVAR", "GF@sum")
+    builder.add("DEFVAR", "GF@t")
+    builder.add("MOVE", "GF@i", "int@0")
+    builder.add("MOVE", "GF@sum", "int@0")
+    builder.add("LABEL", "label@loop")
+    builder.add("MUL", "GF@t", "GF@i", "int@3")
+    builder.add("IDIV", "GF@t", "GF@t", "int@2")
+    builder.add("ADD", "GF@sum", "GF@sum", "GF@i")
+    builder.add("SUB", "GF@sum", "GF@sum", "GF@t")
+    builder.add("ADD", "GF@i", "GF@i", "int@1")
+    builder.add("JUMPIFNEQ", "label@loop", "GF@i", "int@" + str(iterations))
+    builder.add("WRITE", "GF@sum")
+    return builder.to_xml(), None
+
+
+# Hluboká rekurze přes CALL, CREATEFRAME/PUSHFRAME a POPFRAME
+def recursion(scale):
+    repeats = max(1, int(60 * scale))
+    builder = ProgramBuilder()
+    builder.add("DEFVAR", "GF@r")
+    builder.add("DEFVAR", "GF@n")
+    builder.add("DEFVAR", "GF@k")
+    builder.add("MOVE", "GF@k", "int@0")
+    builder.add("LABEL", "label@again")
+    builder.add("MOVE", "GF@n", "int@1000")
+    builder.add("CALL", "label@sum")
+    builder.add("ADD", "GF@k", "GF@k", "int@1")
+    builder.add("JUMPIFNEQ", "label@again", "GF@k", "int@" + str(repeats))
+    builder.add("WRITE", "GF@r")
+    builder.add("JUMP", "label@end")
+    # sum(n) = n + sum(n - 1), výsledek v GF@r
+    builder.add("LABEL", "label@sum")
+    builder.add("CREATEFRAME")
+    builder.add("PUSHFRAME")
+    builder.add("DEFVAR", "LF@n")
+    builder.add("MOVE", "LF@n", "GF@n")
+    builder.add("JUMPIFNEQ", "label@rec", "LF@n", "int@0")
+    builder.add("MOVE", "GF@r", "int@0")
+    builder.add("POPFRAME")
+    builder.add("RETURN")
+    builder.add("LABEL", "label@rec")
+    builder.add("SUB", "GF@n", "LF@n", "int@1")
+    builder.add("CALL", "label@sum")
+    builder.add("ADD", "GF@r", "GF@r", "LF@n")
+    builder.add("POPFRAME")
+    builder.add("RETURN")
+    builder.add("LABEL", "label@end")
+    return builder.to_xml(), None
+
+
+# Skládání řetězce instrukcí CONCAT a jeho přepisování instrukcí SETCHAR
+def strings(scale):
+    length = max(2, int(10000 * scale))
+    builder = ProgramBuilder()
+    builder.add("DEFVAR", "GF@s")
+    builder.add("DEFVAR", "GF@i")
+    builder.add("DEFVAR", "GF@c")
+    builder.add("MOVE", "GF@s", "string@")
+    builder.add("MOVE", "GF@i", "int@0")
+    builder.add("LABEL", "label@build")
+    builder.add("CONCAT", "GF@s", "GF@s", "string@ab")
+    builder.add("ADD", "GF@i", "GF@i", "int@1")
+    builder.add("JUMPIFNEQ", "label@build", "GF@i", "int@" + str(length // 2))
+    builder.add("MOVE", "GF@i", "int@0")
+    builder.add("LABEL", "label@rewrite")
+    builder.add("GETCHAR", "GF@c", "GF@s", "GF@i")
+    builder.add("SETCHAR", "GF@s", "GF@i", "string@x")
+    builder.add("ADD", "GF@i", "GF@i", "int@1")
+    builder.add("JUMPIFNEQ", "label@rewrite", "GF@i", "int@" + str(length))
+    builder.add("STRLEN", "GF@i", "GF@s")
+    builder.add("WRITE", "GF@i")
+    return builder.to_xml(), None
+
+
+# Aritmetika na datovém zásobníku rozšíření STACK. Zásobníkové instrukce
+# operandy ze zásobníku neodebírají, proto po každém výsledku vyzvednutém
+# instrukcí POPS a na začátku smyčky (po JUMPIFNEQS) následuje CLEARS,
+# jinak by zásobník s každou iterací rostl.
+def stack_arithmetic(scale):
+    iterations = max(1, int(40000 * scale))
+    builder = ProgramBuilder()
+    builder.add("DEFVAR", "GF@i")
+    builder.add("DEFVAR", "GF@x")
+    builder.add("DEFVAR", "GF@t")
+    builder.add("MOVE", "GF@i", "int@0")
+    builder.add("MOVE", "GF@x", "int@0")
+    builder.add("LABEL", "label@loop")
+    builder.add("CLEARS")
+    builder.add("PUSHS", "GF@i")
+    builder.add("PUSHS", "int@7")
+    builder.add("MULS")
+    builder.add("POPS", "GF@t")
+    builder.add("CLEARS")
+    builder.add("PUSHS", "GF@x")
+    builder.add("PUSHS", "GF@t")
+    builder.add("ADDS")
+    builder.add("POPS", "GF@x")
+    builder.add("CLEARS")
+    builder.add("PUSHS", "GF@x")
+    builder.add("PUSHS", "int@3")
+    builder.add("IDIVS")
+    builder.add("POPS", "GF@x")
+    builder.add("CLEARS")
+    builder.add("PUSHS", "GF@i")
+    builder.add("PUSHS", "int@1")
+    builder.add("ADDS")
+    builder.add("POPS", "GF@i")
+    builder.add("CLEARS")
+    builder.add("PUSHS", "GF@i")
+    builder.add("PUSHS", "int@" + str(iterations))
+    builder.add("JUMPIFNEQS", "label@loop")
+    builder.add("WRITE", "GF@x")
+    return builder.to_xml(), None
+
+
+# Filtr, který čte vstup po řádcích instrukcí READ a vypisuje jej instrukcí WRITE
+def read_write_filter(scale):
+    lines = max(1, int(100000 * scale))
+    builder = ProgramBuilder()
+    builder.add("DEFVAR", "GF@line")
+    builder.add("DEFVAR", "GF@type")
+    builder.add("LABEL", "label@loop")
+    builder.add("READ", "GF@line", "type@int")
+    builder.add("TYPE", "GF@type", "GF@line")
+    builder.add("JUMPIFEQ", "label@end", "GF@type", "string@nil")
+    builder.add("MUL", "GF@line", "GF@line", "int@2")
+    builder.add("WRITE", "GF@line")
+    builder.add("WRITE", "string@\\010")
+    builder.add("JUMP", "label@loop")
+    builder.add("LABEL", "label@end")
+    return builder.to_xml(), "".join(str(i) + "\n" for i in range(lines))
+
+
+# Program se 100 000 instrukcemi, který hned skočí na konec, měří se načtení
+def load(scale):
+    instructions = max(10, int(100000 * scale))
+    builder = ProgramBuilder()
+    builder.add("DEFVAR", "GF@x")
+    builder.add("MOVE", "GF@x", "int@0")
+    builder.add("JUMP", "label@end")
+    for i in range(instructions - 4):
+        builder.add("ADD", "GF@x", "GF@x", "int@" + str(i))
+    builder.add("LABEL", "label@end")
+    return builder.to_xml(), None
+
+
+WORKLOADS = {
+    "int_loop": int_loop,
+    "recursion": recursion,
+    "strings": strings,
+    "stack_arithmetic": stack_arithmetic,
+    "read_write_filter": read_write_filter,
+    "load": load,
+}
@@ -5,7 +5,24 @@
 # -----------------------------------------------------------
 
 import argparse
+import collections
+import contextlib
+import enum
+import functools
+import hashlib
+import io
+import json
+import marshal
+import multiprocessing
+import multiprocessing.connection
+import operator
+import os
 import re
+import socket
+import stat
+import struct
+import time
+import traceback
 import xml.etree.ElementTree as ET
 import sys
 
@@ -31,6 +48,13 @@ ERROR_56 = 56  # chybějící hodnota
 ERROR_57 = 57  # špatná hodnota operandu
 ERROR_58 = 58  # chybná práce s řetězcem
 
+# -----------------------------------------------------------
+# Překročení limitů --max-steps, --timeout a --max-memory
+# -----------------------------------------------------------
+ERROR_60 = 60  # překročen počet vykonaných instrukcí
+ERROR_61 = 61  # překročena doba běhu
+ERROR_62 = 62  # překročena paměť
+
 # -----------------------------------------------------------
 # Interní chyby
 # -----------------------------------------------------------
@@ -49,6 +73,45 @@ options:
                         optional path for source file
     -i=INPUT, --input=INPUT
                         optional path for input file§
+    --output=PATH
+                        optional path for program output, default is stdout
+    --flush=line|block|exit
+                        when program output is written out, default is block
+    --opt=0|1|2
+                        1 fuses common instruction sequences into superinstructions,
+                        2 also drops runtime type checks proven by type inference
+    --cache-dir=PATH
+                        directory where decoded programs are cached by source hash
+    --profile=PATH
+                        write per instruction and per opcode counts and times to PATH
+                        and PATH.json
+    --serve=SOCKET
+                        serve (program, input) requests on a Unix socket, see InterpretServer
+    --workers=N
+                        number of worker processes for --serve, default is the CPU count
+    --serve-cache=N
+                        decoded programs kept by each --serve worker, default is 128
+    --batch=MANIFEST
+                        run the JSONL manifest of source/input/expected cases and print
+                        one JSON result per case, see BatchRunner
+    --jobs=N
+                        number of worker processes for --batch, default is the CPU count
+    --compile-to=PATH
+                        translate the program to a Python module and exit, the module
+                        takes the same options except --source
+    --max-steps=N
+                        stop after N executed instructions of the source program,
+                        counted as by --insts with any --opt or --compile-to,
+                        with exit code 60
+    --timeout=SECONDS
+                        stop when the program runs longer than SECONDS with exit code 61
+    --max-memory=MIB
+                        stop when the program grows the process by more than MIB
+                        mebibytes with exit code 62
+                        a stopped program reports the limit and its usage on stderr
+                        and writes the --stats collected so far, with --serve and
+                        --batch the limits apply to every request, which can only
+                        lower them
                         
 extension:
     --stats=PATH 
@@ -125,6 +188,64 @@ OPCODE_REQUIREMENTS = {
     "JUMPIFNEQS": ["label"]
 }
 
+# -----------------------------------------------------------
+# Superinstrukce vytvářené optimalizací --opt=1, nejsou součástí
+# jazyka a ve vstupním xml je validátor nepřijme
+# -----------------------------------------------------------
+SUPERINSTRUCTIONS = ["STACK_OPERATION", "DEFVAR_MOVE", "COMPARE_JUMP", "INLINE_CALL"]
+
+# -----------------------------------------------------------
+# Instrukce bez typových kontrol vytvářené typovou analýzou --opt=2
+# tam, kde je typ operandů dokázán, ve vstupním xml je validátor nepřijme
+# -----------------------------------------------------------
+TYPED_INSTRUCTIONS = ["ADD_INT", "SUB_INT", "MUL_INT", "IDIV_INT", "LT_TYPED", "GT_TYPED", "EQ_TYPED", "AND_BOOL",
+                      "OR_BOOL", "NOT_BOOL", "CONCAT_STR", "STRLEN_STR", "GETCHAR_STR", "STRI2INT_STR",
+                      "JUMPIFEQ_TYPED", "JUMPIFNEQ_TYPED", "COMPARE_JUMP_TYPED"]
+
+# -----------------------------------------------------------
+# Číselné označení instrukcí ve stejném pořadí jako OPCODE_REQUIREMENTS
+# následované superinstrukcemi a typově specializovanými instrukcemi
+# -----------------------------------------------------------
+Opcode = enum.IntEnum("Opcode", list(OPCODE_REQUIREMENTS) + SUPERINSTRUCTIONS + TYPED_INSTRUCTIONS, start=0)
+
+# -----------------------------------------------------------
+# Dekódovaná instrukce
+#
+# opcode je hodnota Opcode, args je n-tice operandů ve tvaru, v jakém je
+# přijímá obslužná metoda instrukce: var je trojice (rámec, slot, jméno),
+# label a type jsou řetězce a symb je dvojice (typ, hodnota), kde proměnná
+# má typ "var" a hodnotu (rámec, slot, jméno), order je původní pořadí
+# instrukce v xml dokumentu
+# -----------------------------------------------------------
+Instruction = collections.namedtuple("Instruction", ["opcode", "args", "order"])
+
+# -----------------------------------------------------------
+# Typy argumentů přijímané jednotlivými požadavky a pro každou instrukci
+# předpočítaná n-tice množin typů přijímaných jejími argumenty
+# -----------------------------------------------------------
+ARGUMENT_TYPES = frozenset(["string", "int", "bool", "label", "type", "nil", "var"])
+REQUIREMENT_TYPES = {
+    "label": frozenset(["label"]),
+    "type": frozenset(["type"]),
+    "var": frozenset(["var"]),
+    "symb": frozenset(["var", "bool", "string", "int", "nil"]),
+    # SETCHAR historicky nekontroluje typ svého druhého argumentu
+    "symb1": ARGUMENT_TYPES,
+}
+ACCEPTED_TYPES = {opcode: tuple(REQUIREMENT_TYPES[requirement] for requirement in requirements)
+                  for opcode, requirements in OPCODE_REQUIREMENTS.items()}
+
+# -----------------------------------------------------------
+# Instrukce, jejichž prvním argumentem je návěští
+# -----------------------------------------------------------
+LABEL_OPCODES = frozenset(Opcode[opcode] for opcode, requirements in OPCODE_REQUIREMENTS.items()
+                          if len(requirements) > 0 and requirements[0] == "label")
+
+# -----------------------------------------------------------
+# Povolený zápis celočíselné konstanty (stejně jako v parse.php)
+# -----------------------------------------------------------
+INT_LITERAL = re.compile(r"[+-]?(?:0[xX][0-9a-fA-F]+|0[oO][0-7]+|[0-9]+)")
+
 # -----------------------------------------------------------
 # XmlValidator
 #
@@ -133,77 +254,65 @@ OPCODE_REQUIREMENTS = {
 
 
 class XmlValidator:
+    ARGUMENT_TAGS = ("arg1", "arg2", "arg3")
+
     def __init__(self, interpret):
         self.interpret = interpret
-        self.labels = []
+        self.labels = set()
 
-    # validuje hlavičku vstupního xml souboru
-    def header_validator(self):
-        if self.interpret.arguments_validator.source_data.tag != "program":
+    # validuje hlavičku vstupního xml souboru, stačí jí počáteční značka kořene
+    def header_validator(self, program):
+        if program.tag != "program":
             exit(ERROR_32)
-        for attribute in self.interpret.arguments_validator.source_data.attrib:
+        for attribute in program.attrib:
             if attribute not in ["language", "name", "description"]:
                 exit(ERROR_32)
-        if "language" not in self.interpret.arguments_validator.source_data.attrib:
+        if "language" not in program.attrib:
             exit(ERROR_31)
-        if self.interpret.arguments_validator.source_data.attrib["language"] != "IPPcode23":
+        if program.attrib["language"] != "IPPcode23":
             exit(ERROR_32)
 
-    # validuje tělo vstupního xml souboru
-    def xml_body_validator(self):
-        already_used_numbers = []
-        for instruction in self.interpret.arguments_validator.source_data:
-            if instruction.tag != "instruction":
-                exit(ERROR_32)
-            if instruction.attrib.get("opcode") is None or instruction.attrib.get("order") is None:
-                exit(ERROR_32)
-            if instruction.attrib.get("opcode").upper() not in OPCODE_REQUIREMENTS:
-                exit(ERROR_32)
-            if not instruction.attrib.get("order").isnumeric():
-                exit(ERROR_32)
-            if int(instruction.attrib.get("order")) < 1 or instruction.attrib.get("order") in already_used_numbers:
-                exit(ERROR_32)
-            already_used_numbers.append(instruction.attrib.get("order"))
-            self.instruction_childs_validator(instruction)
-            self.interpret.stats_manager.instructions_opcodes.append(instruction.attrib.get('opcode').upper())
+    # validuje jednu instrukci těla vstupního xml souboru, arguments jsou její
+    # děti seřazené podle značky, used_orders jsou order dosud uložených
+    # instrukcí, vrátí operační kód a order instrukce
+    def instruction_validator(self, instruction, arguments, used_orders):
+        if instruction.tag != "instruction":
+            exit(ERROR_32)
+        opcode = instruction.attrib.get("opcode")
+        order = instruction.attrib.get("order")
+        if opcode is None or order is None:
+            exit(ERROR_32)
+        opcode = opcode.upper()
+        accepted_types = ACCEPTED_TYPES.get(opcode)
+        if accepted_types is None:
+            exit(ERROR_32)
+        if not order.isdecimal():
+            exit(ERROR_32)
+        order = int(order)
+        if order < 1 or order in used_orders:
+            exit(ERROR_32)
+        self.instruction_childs_validator(opcode, arguments, accepted_types)
+        return opcode, order
 
-    # validuje děti ve vstupním xml souboru
-    def instruction_childs_validator(self, instruction):
-        if len(instruction) != len(OPCODE_REQUIREMENTS[instruction.attrib.get("opcode").upper()]):
+    # validuje děti instrukce podle předpočítaných přijímaných typů, značky
+    # musí po seřazení odpovídat přesně arg1 až argN
+    def instruction_childs_validator(self, opcode, arguments, accepted_types):
+        if len(arguments) != len(accepted_types):
             exit(ERROR_32)
-        tags = []
-        args = ["arg1", "arg2", "arg3"]
-        label_accept = "label"
-        type_accept = "type"
-        var_accept = "var"
-        symb_accept = ["var", "bool", "string", "int", "nil"]
-
-        for i, argument in enumerate(instruction):
-            if "type" not in argument.attrib:
+        for i, argument in enumerate(arguments):
+            a_type = argument.attrib.get("type")
+            if a_type not in ARGUMENT_TYPES:
                 exit(ERROR_32)
-            if argument.attrib["type"] not in ["string", "int", "bool", "label", "type", "nil", "var"]:
+            if argument.tag == self.ARGUMENT_TAGS[i] and a_type not in accepted_types[i]:
                 exit(ERROR_32)
-            if len(instruction) >= (i + 1) and args[i] == argument.tag:
-                if OPCODE_REQUIREMENTS[instruction.attrib.get("opcode").upper()][i] == "label" and argument.attrib[
-                    "type"] != label_accept:
-                    exit(ERROR_32)
-                elif OPCODE_REQUIREMENTS[instruction.attrib.get("opcode").upper()][i] == "type" and argument.attrib[
-                    "type"] != type_accept:
-                    exit(ERROR_32)
-                elif OPCODE_REQUIREMENTS[instruction.attrib.get("opcode").upper()][i] == "var" and argument.attrib[
-                    "type"] != var_accept:
-                    exit(ERROR_32)
-                elif OPCODE_REQUIREMENTS[instruction.attrib.get("opcode").upper()][i] == "symb" and argument.attrib[
-                    "type"] not in symb_accept:
-                    exit(ERROR_32)
-            if instruction.attrib.get("opcode").upper() == "LABEL":
-                if argument.text.strip() in self.labels:
+            if opcode == "LABEL":
+                label = argument.text.strip()
+                if label in self.labels:
                     exit(ERROR_52)
-                self.labels.append(argument.text.strip())
-            tags.append(argument.tag)
+                self.labels.add(label)
 
-        for i in range(len(tags)):
-            if args[i] not in tags:
+        for i, argument in enumerate(arguments):
+            if argument.tag != self.ARGUMENT_TAGS[i]:
                 exit(ERROR_32)
 
 
@@ -218,8 +327,7 @@ class ArgumentsValidator:
         self.interpret = interpret
         self.arguments = None
         self.args_parser = None
-        self.source_data = None
-        self.input_data = None
+        self.input_reader = None
         self.input_file = None
 
     # Vytváří parser z knihovny argparse který parsuje vstupní parametry a následně
@@ -237,6 +345,20 @@ class ArgumentsValidator:
             arg_parser.add_argument("--frequent", action='store_true')
             arg_parser.add_argument("--print", nargs='*', action='append', type=str)
             arg_parser.add_argument("--eol", action='store_true')
+            arg_parser.add_argument("--output", type=str)
+            arg_parser.add_argument("--flush", type=str, choices=OutputSink.FLUSH_POLICIES)
+            arg_parser.add_argument("--opt", type=int, choices=[0, 1, 2])
+            arg_parser.add_argument("--cache-dir", type=str)
+            arg_parser.add_argument("--compile-to", type=str)
+            arg_parser.add_argument("--profile", type=str)
+            arg_parser.add_argument("--serve", type=str)
+            arg_parser.add_argument("--workers", type=int)
+            arg_parser.add_argument("--serve-cache", type=int)
+            arg_parser.add_argument("--batch", type=str)
+            arg_parser.add_argument("--jobs", type=int)
+            arg_parser.add_argument("--max-steps", type=int)
+            arg_parser.add_argument("--timeout", type=float)
+            arg_parser.add_argument("--max-memory", type=float)
             args = arg_parser.parse_args()
         except:
             exit(ERROR_10)
@@ -253,7 +375,14 @@ class ArgumentsValidator:
 
         if args.help:
             if args.input is not None or args.source is not None or args.stats is not None or args.insts or \
-                    args.hot or args.vars or args.frequent or args.eol or args.print is not None:
+                    args.hot or args.vars or args.frequent or args.eol or args.print is not None or \
+                    args.output is not None or args.flush is not None or args.opt is not None or \
+                    args.cache_dir is not None or \
+                    args.compile_to is not None or \
+                    args.profile is not None or \
+                    args.serve is not None or args.workers is not None or args.serve_cache is not None or \
+                    args.batch is not None or args.jobs is not None or \
+                    args.max_steps is not None or args.timeout is not None or args.max_memory is not None:
                 exit(ERROR_10)
             else:
                 print(HELP)
@@ -264,82 +393,983 @@ class ArgumentsValidator:
             exit(ERROR_10)
 
         self.interpret.stats_manager.stats_file = vars(args).get('stats')
+        self.interpret.profiler.profile_file = args.profile
         self.args_parser = args
 
+        if args.output is not None:
+            try:
+                self.interpret.output_sink.output_file = open(args.output, "wb")
+            except:
+                exit(ERROR_12)
+        if args.flush is not None:
+            self.interpret.output_sink.flush_policy = args.flush
+        limits = {"max_steps": args.max_steps, "timeout": args.timeout, "max_memory": args.max_memory}
+        self.interpret.resource_governor.configure(limits)
+
+        if self.interpret.compiled is not None:
+            self.interpret.python_compiler.load(self.interpret.compiled)
+            self.open_input(args)
+            return
+        if args.serve is not None:
+            workers = (os.cpu_count() or 1) if args.workers is None else args.workers
+            serve_cache = ProgramRunner.DEFAULT_CACHE_SIZE if args.serve_cache is None else args.serve_cache
+            if workers < 1 or serve_cache < 0:
+                exit(ERROR_10)
+            InterpretServer(args.serve, workers, serve_cache, limits).serve()
+            exit(ERROR_0)
+        if args.batch is not None:
+            jobs = (os.cpu_count() or 1) if args.jobs is None else args.jobs
+            if jobs < 1:
+                exit(ERROR_10)
+            BatchRunner(args.batch, jobs, limits).run()
+            exit(ERROR_0)
         if args.input is None and args.source is None:
             exit(ERROR_10)
         self.load_data(args)
-
-    # Obsluhuje kontrolu xml vstupu a seřazuje objekty xml podle jejich
-    # order pro snažší vykonávání programu a načítá vstup a kontroluje práva uživatele
+        if args.compile_to is not None:
+            self.interpret.python_compiler.compile(args.compile_to)
+            exit(ERROR_0)
+        if args.opt is not None and args.opt >= 1:
+            self.interpret.peephole_optimizer.optimize()
+        if args.opt == 2:
+            self.interpret.type_inference.specialize()
+
+    # Otevře xml vstup a nechá jej proudově zvalidovat a dekódovat, následně
+    # načítá vstup a kontroluje práva uživatele
     def load_data(self, args):
         try:
             if args.source is None:
-                self.source_data = ET.fromstring(sys.stdin.read())
-
+                source_file = sys.stdin.buffer
             else:
-                source_file = ET.parse(args.source)
-                self.source_data = source_file.getroot()
+                source_file = open(args.source, "rb")
         except:
             exit(ERROR_31)
 
-        self.interpret.xml_validator.header_validator()
-        self.interpret.xml_validator.xml_body_validator()
-
-        self.source_data[:] = sorted(self.source_data, key=lambda child: int(child.get('order')))
-
-        for c in self.source_data:
-            c[:] = sorted(c, key=lambda child: child.tag)
+        if args.cache_dir is None:
+            self.interpret.program_decoder.load(source_file)
+        else:
+            self.load_cached(source_file, args.cache_dir)
+        if source_file is not sys.stdin.buffer:
+            source_file.close()
+        self.open_input(args)
 
+    # Otevře vstup pro instrukci READ
+    def open_input(self, args):
         if args.input is None:
-            self.input_data = sys.stdin.read().splitlines()
+            self.input_file = sys.stdin
         else:
             try:
                 self.input_file = open(args.input, "r")
-                self.input_data = self.input_file.read().splitlines()
             except:
                 exit(ERROR_11)
+        self.input_reader = InputReader(self.input_file)
+
+    # Načte program z cache podle hashe zdrojových bajtů, jinak jej
+    # dekóduje z xml a do cache uloží
+    def load_cached(self, source_file, cache_dir):
+        try:
+            source = source_file.read()
+        except:
+            exit(ERROR_11)
+        program_cache = ProgramCache(self.interpret, cache_dir)
+        key = program_cache.key(source)
+        if not program_cache.load(key):
+            self.interpret.program_decoder.load(io.BytesIO(source))
+            program_cache.store(key)
+
+
+# -----------------------------------------------------------
+# InputReader
+#
+# Čte vstup pro instrukci READ po jednotlivých řádcích až ve chvíli,
+# kdy jsou potřeba, v paměti je tak vždy jen aktuální řádek a interpret
+# lze použít i jako filtr v rouře
+# -----------------------------------------------------------
+class InputReader:
+    def __init__(self, input_file):
+        self.input_file = input_file
+
+    # Vrátí další řádek vstupu bez konce řádku nebo None na konci vstupu
+    def read_line(self):
+        line = self.input_file.readline()
+        if line == "":
+            return None
+        if line[-1] == "\n":
+            line = line[:-1]
+        return line
+
+
+# -----------------------------------------------------------
+# OutputSink
+#
+# Sbírá výstup instrukce WRITE do vyrovnávací paměti a zapisuje jej
+# hromadně. Politika line vypisuje po každém konci řádku, block po
+# naplnění vyrovnávací paměti a exit až na konci programu. Před EXIT,
+# BREAK a DPRINT se vždy vyprázdní kvůli pořadí výstupu vůči stderr.
+# -----------------------------------------------------------
+class OutputSink:
+    FLUSH_POLICIES = ["line", "block", "exit"]
+    BLOCK_SIZE = 65536
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.flush_policy = "block"
+        self.buffer = []
+        self.size = 0
+
+    # Přidá text do vyrovnávací paměti a podle politiky ji případně vyprázdní
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.flush_policy == "line":
+            if "\n" in text:
+                self.flush()
+        elif self.flush_policy == "block" and self.size >= self.BLOCK_SIZE:
+            self.flush()
+
+    # Zapíše obsah vyrovnávací paměti do výstupního souboru
+    def flush(self):
+        if self.size > 0:
+            self.output_file.write("".join(self.buffer).encode("utf-8"))
+            self.buffer = []
+            self.size = 0
+        self.output_file.flush()
+
+
+# -----------------------------------------------------------
+# ProgramDecoder
+#
+# Proudově čte xml vstup, každou instrukci hned po načtení zvaliduje,
+# dekóduje včetně přidělení slotů proměnným a uvolní, takže se
+# v paměti nikdy nedrží celý xml strom ani druhá kopie programu.
+# Výsledkem je n-tice dekódovaných instrukcí seřazená podle order.
+# -----------------------------------------------------------
+class ProgramDecoder:
+    ARGUMENT_TAG = operator.attrgetter("tag")
+
+    def __init__(self, interpret):
+        self.interpret = interpret
+        self.slots = None
+        self.resolved = None
+
+    # Načte program z xml proudu, chyba formátu xml (31) má přednost před
+    # chybou struktury nalezenou dříve, proto se po první chybě validace
+    # dokument jen dočte a program se ukončí až po jeho přečtení
+    def load(self, source_file):
+        local_slots = {}
+        self.slots = {"GF": {}, "LF": local_slots, "TF": local_slots}
+        self.resolved = {}
+        instructions = {}
+        events = ET.iterparse(source_file, events=("start", "end"))
+        try:
+            load_error = self.catch_error(self.store_instructions, events, instructions)
+            for event, element in events:
+                if event == "end":
+                    element.clear()
+        except ET.ParseError:
+            exit(ERROR_31)
+        if load_error is not None:
+            exit(load_error)
+
+        self.interpret.program = tuple(instructions[order] for order in sorted(instructions))
+        self.interpret.source_program = self.interpret.program
+        self.interpret.frame_manager.gf = Frame(len(self.slots["GF"]))
+        self.build_label_table()
+
+    # Prochází události xml proudu, kořen zvaliduje hned při jeho otevření
+    # a každou instrukci po jejím přečtení uloží a uvolní
+    def store_instructions(self, events, instructions):
+        depth = 0
+        program = None
+        for event, element in events:
+            if event == "start":
+                depth += 1
+                if depth == 1:
+                    program = element
+                    self.interpret.xml_validator.header_validator(program)
+                continue
+            depth -= 1
+            if depth == 1:
+                self.store_instruction(element, instructions)
+                program.clear()
+
+    # Zavolá validační metodu a místo ukončení programu vrátí chybový kód
+    def catch_error(self, method, *args):
+        try:
+            method(*args)
+        except SystemExit as error:
+            return error.code
+        return None
+
+    # Zvaliduje a dekóduje jednu instrukci v jednom průchodu jejími dětmi
+    # a uloží ji pod jejím order, slovník zajišťuje kontrolu duplicitního
+    # order v konstantním čase
+    def store_instruction(self, instruction, instructions):
+        arguments = sorted(instruction, key=self.ARGUMENT_TAG)
+        opcode, order = self.interpret.xml_validator.instruction_validator(instruction, arguments, instructions)
+        requirements = OPCODE_REQUIREMENTS[opcode]
+        args = []
+        for i, argument in enumerate(arguments):
+            args.append(self.decode_operand(argument, requirements[i]))
+        instructions[order] = Instruction(Opcode[opcode], tuple(args), order)
+
+    # Sestaví tabulku návěští a jejich indexů v programu a ověří, že všechny
+    # skoky směřují na existující návěští
+    def build_label_table(self):
+        label_table = {}
+        for i, instruction in enumerate(self.interpret.program):
+            if instruction.opcode == Opcode.LABEL:
+                label_table[instruction.args[0]] = i
+        for instruction in self.interpret.program:
+            if instruction.opcode in LABEL_OPCODES and instruction.args[0] not in label_table:
+                exit(ERROR_52)
+        self.interpret.label_table = label_table
+
+    # Dekóduje operand podle požadavku instrukce. Proměnná je předána jako
+    # trojice (rámec, slot, jméno), na místě symb jako ("var", trojice),
+    # návěští a typ jako řetězec a konstanty jako (typ, hodnota).
+    def decode_operand(self, argument, requirement):
+        a_type = argument.get("type")
+        text = "" if argument.text is None else argument.text.strip()
+        if a_type == "var":
+            var = self.resolve_var(text)
+            return var if requirement == "var" else ("var", var)
+        if requirement == "label" or requirement == "type":
+            return text
+        if a_type == "int":
+            return a_type, self.decode_int(text)
+        if a_type == "bool":
+            if text.lower() == "true":
+                return a_type, True
+            if text.lower() == "false":
+                return a_type, False
+            exit(ERROR_32)
+        if a_type == "nil":
+            return a_type, None
+        if a_type == "string":
+            return a_type, self.interpret.utilities.convert_escaped_string(text)
+        return a_type, text
+
+    # Převede zápis proměnné rámec@jméno na sdílenou trojici (rámec, slot, jméno).
+    # GF má vlastní číslování slotů a LF s TF sdílí jedno, protože dočasný
+    # rámec se instrukcí PUSHFRAME stává lokálním.
+    def resolve_var(self, text):
+        var = self.resolved.get(text)
+        if var is None:
+            frame, separator, name = text.partition("@")
+            if separator == "" or frame not in self.slots:
+                exit(ERROR_32)
+            frame_slots = self.slots[frame]
+            if name not in frame_slots:
+                frame_slots[name] = len(frame_slots)
+            var = (frame, frame_slots[name], name)
+            self.resolved[text] = var
+        return var
+
+    # Převede celočíselnou konstantu v desítkovém, šestnáctkovém nebo osmičkovém zápisu
+    def decode_int(self, text):
+        if text.isascii() and text.isdigit():
+            return int(text)
+        if INT_LITERAL.fullmatch(text) is None:
+            exit(ERROR_32)
+        sign = -1 if text[0] == "-" else 1
+        digits = text.lstrip("+-").lower()
+        if digits.startswith("0x"):
+            return sign * int(digits[2:], 16)
+        if digits.startswith("0o"):
+            return sign * int(digits[2:], 8)
+        return sign * int(digits)
+
+
+# -----------------------------------------------------------
+# ProgramCache
+#
+# Ukládá zvalidovaný a dekódovaný program do adresáře --cache-dir,
+# soubor je pojmenován hashem zdrojového xml. Formát souboru:
+#   MAGIC, VERSION (2 bajty), blake2b hash dat (32 bajtů), data
+# kde data jsou výstupem marshal. Při změně dekódovaných operandů
+# nebo formátu je nutné zvýšit VERSION, starší soubory se pak
+# ignorují a přepíšou. Poškozený soubor se také jen ignoruje.
+# -----------------------------------------------------------
+class ProgramCache:
+    MAGIC = b"IPPC"
+    VERSION = 1
+    DIGEST_SIZE = 32
+
+    def __init__(self, interpret, cache_dir):
+        self.interpret = interpret
+        self.cache_dir = cache_dir
+
+    # Vrátí klíč záznamu pro zdrojové bajty programu
+    def key(self, source):
+        return hashlib.sha256(source).hexdigest()
+
+    # Vrátí cestu k souboru záznamu
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".ippc")
+
+    # Načte program ze záznamu, vrátí False chybí-li nebo je-li neplatný
+    def load(self, key):
+        try:
+            with open(self.entry_path(key), "rb") as entry_file:
+                entry = entry_file.read()
+        except OSError:
+            return False
+
+        header_size = len(self.MAGIC) + 2
+        if entry[:len(self.MAGIC)] != self.MAGIC or \
+                int.from_bytes(entry[len(self.MAGIC):header_size], "little") != self.VERSION:
+            return False
+        digest = entry[header_size:header_size + self.DIGEST_SIZE]
+        data = entry[header_size + self.DIGEST_SIZE:]
+        if hashlib.blake2b(data, digest_size=self.DIGEST_SIZE).digest() != digest:
+            return False
+        try:
+            gf_size, instructions, labels = marshal.loads(data)
+            program = tuple(Instruction(Opcode(opcode), args, order) for opcode, args, order in instructions)
+        except:
+            return False
+
+        self.interpret.program = program
+        self.interpret.source_program = program
+        self.interpret.label_table = dict(labels)
+        self.interpret.frame_manager.gf = Frame(gf_size)
+        return True
+
+    # Uloží právě načtený program, nepovede-li se to, pokračuje se bez cache
+    def store(self, key):
+        instructions = tuple((int(instruction.opcode), instruction.args, instruction.order)
+                             for instruction in self.interpret.program)
+        labels = tuple(self.interpret.label_table.items())
+        data = marshal.dumps((len(self.interpret.frame_manager.gf.slots), instructions, labels))
+        entry = self.MAGIC + self.VERSION.to_bytes(2, "little") + \
+            hashlib.blake2b(data, digest_size=self.DIGEST_SIZE).digest() + data
+
+        path = self.entry_path(key)
+        temp_path = path + "." + str(os.getpid()) + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "wb") as entry_file:
+                entry_file.write(entry)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+# -----------------------------------------------------------
+# PeepholeOptimizer
+#
+# Volitelná optimalizace --opt=1 nad dekódovaným programem, která
+# slučuje časté posloupnosti instrukcí do jediné instrukce:
+#   PUSHS a; PUSHS b; ADDS...; POPS x  ->  STACK_OPERATION (a, b) ADD x a b
+#   PUSHS a; NOTS/INT2CHARS; POPS x    ->  STACK_OPERATION (a,) NOT x a
+#   DEFVAR x; MOVE x s                 ->  DEFVAR_MOVE x s
+#   LT/GT/EQ t a b; JUMPIF(N)EQ l t bool@c  ->  COMPARE_JUMP
+#   CALL f na krátkou funkci bez skoků ->  INLINE_CALL
+# Zásobníkové instrukce operandy ze zásobníku neodebírají, proto
+# STACK_OPERATION operandy na zásobník vloží a výsledek tříadresné
+# instrukce uloží rovnou do proměnné.
+# Pro každou instrukci výsledného programu si pamatuje indexy
+# instrukcí původního programu, aby statistiky odpovídaly původnímu
+# programu.
+# -----------------------------------------------------------
+class PeepholeOptimizer:
+    STACK_BINARY = {"ADDS": "ADD", "SUBS": "SUB", "MULS": "MUL", "IDIVS": "IDIV", "LTS": "LT", "GTS": "GT",
+                    "EQS": "EQ", "ANDS": "AND", "ORS": "OR", "STRI2INTS": "STRI2INT"}
+    STACK_UNARY = {"NOTS": "NOT", "INT2CHARS": "INT2CHAR"}
+    CONTROL_FLOW = ["LABEL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL", "RETURN", "EXIT",
+                    "BREAK"]
+    MAX_INLINE_BODY = 4
+
+    def __init__(self, interpret):
+        self.interpret = interpret
+
+    # Projde program, nahradí nalezené posloupnosti a přepočítá tabulku návěští
+    def optimize(self):
+        source = self.interpret.source_program
+        program = []
+        origins = []
+        i = 0
+        while i < len(source):
+            fused = self.match_stack_operation(source, i) or self.match_defvar_move(source, i) or \
+                self.match_compare_jump(source, i) or self.match_inline_call(source, i)
+            if fused is None:
+                fused = (source[i], (i,), 1)
+            program.append(fused[0])
+            origins.append(fused[1])
+            i += fused[2]
+
+        self.interpret.program = tuple(program)
+        self.interpret.origins = tuple(origins)
+        for i, instruction in enumerate(program):
+            if instruction.opcode == Opcode.LABEL:
+                self.interpret.label_table[instruction.args[0]] = i
+
+    # Ověří, že od indexu i následují instrukce se zadanými operačními kódy
+    def match_opcodes(self, source, i, names):
+        if i + len(names) > len(source):
+            return False
+        for j, names_at in enumerate(names):
+            if source[i + j].opcode.name not in names_at:
+                return False
+        return True
+
+    # PUSHS a; PUSHS b; <binární>S; POPS x a PUSHS a; <unární>S; POPS x
+    def match_stack_operation(self, source, i):
+        if self.match_opcodes(source, i, [["PUSHS"], ["PUSHS"], self.STACK_BINARY, ["POPS"]]):
+            opcode = Opcode[self.STACK_BINARY[source[i + 2].opcode.name]]
+            symbs = (source[i].args[0], source[i + 1].args[0])
+            operation = source[i + 2]._replace(opcode=opcode, args=(source[i + 3].args[0],) + symbs)
+            return source[i]._replace(opcode=Opcode.STACK_OPERATION, args=(symbs, operation)), tuple(range(i, i + 4)), 4
+        if self.match_opcodes(source, i, [["PUSHS"], self.STACK_UNARY, ["POPS"]]):
+            opcode = Opcode[self.STACK_UNARY[source[i + 1].opcode.name]]
+            symbs = (source[i].args[0],)
+            operation = source[i + 1]._replace(opcode=opcode, args=(source[i + 2].args[0],) + symbs)
+            return source[i]._replace(opcode=Opcode.STACK_OPERATION, args=(symbs, operation)), tuple(range(i, i + 3)), 3
+        return None
+
+    # DEFVAR x; MOVE x s
+    def match_defvar_move(self, source, i):
+        if self.match_opcodes(source, i, [["DEFVAR"], ["MOVE"]]) and source[i].args[0] == source[i + 1].args[0]:
+            args = (source[i].args[0], source[i + 1].args[1])
+            return source[i]._replace(opcode=Opcode.DEFVAR_MOVE, args=args), (i, i + 1), 2
+        return None
+
+    # LT/GT/EQ t a b; JUMPIFEQ/JUMPIFNEQ l t bool@c (nebo l bool@c t)
+    def match_compare_jump(self, source, i):
+        if not self.match_opcodes(source, i, [["LT", "GT", "EQ"], ["JUMPIFEQ", "JUMPIFNEQ"]]):
+            return None
+        compare = source[i]
+        jump = source[i + 1]
+        result = ("var", compare.args[0])
+        if jump.args[1] == result and jump.args[2][0] == "bool":
+            constant = jump.args[2][1]
+        elif jump.args[2] == result and jump.args[1][0] == "bool":
+            constant = jump.args[1][1]
+        else:
+            return None
+        jump_if = constant if jump.opcode == Opcode.JUMPIFEQ else not constant
+        args = compare.args + (jump.args[0], compare.opcode.name, jump_if)
+        return compare._replace(opcode=Opcode.COMPARE_JUMP, args=args), (i, i + 1), 2
+
+    # CALL f, kde f je návěští, za kterým do RETURN následuje jen několik
+    # instrukcí bez skoků, návěští a ladících instrukcí
+    def match_inline_call(self, source, i):
+        if source[i].opcode != Opcode.CALL:
+            return None
+        label_index = self.interpret.label_table[source[i].args[0]]
+        return_index = label_index + 1
+        while return_index < len(source) and source[return_index].opcode != Opcode.RETURN:
+            if source[return_index].opcode.name in self.CONTROL_FLOW:
+                return None
+            return_index += 1
+        body_length = return_index - label_index - 1
+        if return_index == len(source) or body_length > self.MAX_INLINE_BODY:
+            return None
+        body = source[label_index + 1:return_index]
+        origins = (i,) + tuple(range(label_index, return_index + 1))
+        return source[i]._replace(opcode=Opcode.INLINE_CALL, args=(body,)), origins, 1
+
+
+# -----------------------------------------------------------
+# TypeInference
+#
+# Volitelná optimalizace --opt=2 spouštěná po PeepholeOptimizer.
+# Dopředná analýza toku dat nad grafem základních bloků programu
+# odvodí pro každou proměnnou globálního rámce množinu typů, které
+# může mít před každou instrukcí (None značí definovanou proměnnou
+# bez hodnoty, "undefined" proměnnou dosud nedefinovanou). Proměnné
+# lokálních a dočasných rámců se nesledují a mohou mít libovolný typ.
+# RETURN pokračuje za kteroukoliv instrukcí CALL. Instrukce, u nichž
+# jsou všechny operandy konstanty nebo definované globální proměnné
+# s typy, které typovou kontrolou vždy projdou, se nahradí instrukcemi
+# z TYPED_INSTRUCTIONS. Ty čtou operandy přímo ze slotů globálního
+# rámce bez kontrol typů, nil a existence proměnné. Kontroly, které
+# selhat mohou (cílová proměnná, hodnoty pro chyby 57 a 58), zůstávají,
+# návratové kódy se proto nemění. Ostatní instrukce zůstanou beze změny.
+# -----------------------------------------------------------
+class TypeInference:
+    ANY_TYPE = frozenset([None, "int", "bool", "string", "nil"])
+    VALUE_TYPES = frozenset(["int", "bool", "string", "nil"])
+    UNDEFINED = frozenset(["undefined"])
+    NOT_VALUE = frozenset([None, "undefined"])
+    NOT_COMPARABLE = frozenset([None, "undefined", "nil"])
+    BLOCK_END = frozenset([Opcode.JUMP, Opcode.JUMPIFEQ, Opcode.JUMPIFNEQ, Opcode.JUMPIFEQS, Opcode.JUMPIFNEQS,
+                           Opcode.COMPARE_JUMP, Opcode.CALL, Opcode.RETURN, Opcode.EXIT])
+    CONDITIONAL_JUMPS = frozenset([Opcode.JUMPIFEQ, Opcode.JUMPIFNEQ, Opcode.JUMPIFEQS, Opcode.JUMPIFNEQS])
+    RESULT_TYPES = {"ADD": "int", "SUB": "int", "MUL": "int", "IDIV": "int", "STRLEN": "int", "STRI2INT": "int",
+                    "LT": "bool", "GT": "bool", "EQ": "bool", "AND": "bool", "OR": "bool", "NOT": "bool",
+                    "COMPARE_JUMP": "bool", "INT2CHAR": "string", "CONCAT": "string", "GETCHAR": "string",
+                    "SETCHAR": "string", "TYPE": "string"}
+    # instrukce, typy, které musí mít všechny její operandy symb, a specializovaná instrukce
+    OPERAND_TYPES = {"ADD": (("int", "int"), "ADD_INT"), "SUB": (("int", "int"), "SUB_INT"),
+                     "MUL": (("int", "int"), "MUL_INT"), "IDIV": (("int", "int"), "IDIV_INT"),
+                     "AND": (("bool", "bool"), "AND_BOOL"), "OR": (("bool", "bool"), "OR_BOOL"),
+                     "NOT": (("bool",), "NOT_BOOL"), "CONCAT": (("string", "string"), "CONCAT_STR"),
+                     "STRLEN": (("string",), "STRLEN_STR"), "GETCHAR": (("string", "int"), "GETCHAR_STR"),
+                     "STRI2INT": (("string", "int"), "STRI2INT_STR")}
+    # instrukce, jejíž dva operandy musí mít stejný typ různý od nil, a specializovaná instrukce
+    SAME_TYPES = {"LT": "LT_TYPED", "GT": "GT_TYPED", "EQ": "EQ_TYPED", "JUMPIFEQ": "JUMPIFEQ_TYPED",
+                  "JUMPIFNEQ": "JUMPIFNEQ_TYPED", "COMPARE_JUMP": "COMPARE_JUMP_TYPED"}
+
+    def __init__(self, interpret):
+        self.interpret = interpret
+        # tabulky podle názvů převedené na Opcode a množiny typů, aby analýza nečetla názvy instrukcí
+        self.result_types = {Opcode[name]: frozenset([v_type]) for name, v_type in self.RESULT_TYPES.items()}
+        self.operand_types = {Opcode[name]: (tuple(frozenset([v_type]) for v_type in expected), Opcode[specialized])
+                              for name, (expected, specialized) in self.OPERAND_TYPES.items()}
+        self.same_types = {Opcode[name]: Opcode[specialized] for name, specialized in self.SAME_TYPES.items()}
+
+    # Odvodí typy na začátcích bloků a nahradí instrukce s dokázanými typy
+    def specialize(self):
+        program = self.interpret.program
+        specialized = list(program)
+        entry_states = self.analyze(program)
+        for start, state in entry_states.items():
+            i = start
+            while True:
+                specialized[i] = self.specialize_instruction(program[i], state)
+                self.transfer(program[i], state)
+                i += 1
+                if i == len(program) or self.ends_block(program, i):
+                    break
+        self.interpret.program = tuple(specialized)
+
+    # Vrátí True, začíná-li na indexu i nový blok, tedy jde o návěští nebo
+    # předchozí instrukce je skok, volání, návrat či EXIT
+    def ends_block(self, program, i):
+        return program[i].opcode == Opcode.LABEL or program[i - 1].opcode in self.BLOCK_END
+
+    # Spočítá pevný bod stavů na začátcích dosažitelných bloků, stav je
+    # slovník slot globální proměnné -> množina možných typů, chybějící
+    # slot značí proměnnou dosud nedefinovanou
+    def analyze(self, program):
+        return_points = [i + 1 for i, instruction in enumerate(program)
+                         if instruction.opcode == Opcode.CALL and i + 1 < len(program)]
+        entry_states = {0: {}} if len(program) > 0 else {}
+        worklist = collections.deque(entry_states)
+        queued = set(worklist)
+        while len(worklist) > 0:
+            start = worklist.popleft()
+            queued.discard(start)
+            state = dict(entry_states[start])
+            i = start
+            while True:
+                self.transfer(program[i], state)
+                i += 1
+                if i == len(program) or self.ends_block(program, i):
+                    break
+            for successor in self.successors(program[i - 1], i, return_points):
+                if self.join(entry_states, successor, state) and successor not in queued:
+                    worklist.append(successor)
+                    queued.add(successor)
+        return entry_states
+
+    # Vrátí indexy bloků, kterými může program pokračovat po poslední
+    # instrukci bloku, following je index za ní
+    def successors(self, instruction, following, return_points):
+        opcode = instruction.opcode
+        label_table = self.interpret.label_table
+        if opcode == Opcode.JUMP or opcode == Opcode.CALL:
+            return [label_table[instruction.args[0]]]
+        if opcode == Opcode.RETURN:
+            return return_points
+        if opcode == Opcode.EXIT:
+            return []
+        if opcode == Opcode.COMPARE_JUMP:
+            successors = [label_table[instruction.args[3]]]
+        elif opcode in self.CONDITIONAL_JUMPS:
+            successors = [label_table[instruction.args[0]]]
+        else:
+            successors = []
+        if following < len(self.interpret.program):
+            successors.append(following)
+        return successors
+
+    # Přidá stav do stavu na začátku bloku start, vrátí True při změně
+    def join(self, entry_states, start, state):
+        entry_state = entry_states.get(start)
+        if entry_state is None:
+            entry_states[start] = dict(state)
+            return True
+        changed = False
+        for slot, types in state.items():
+            entry_types = entry_state.get(slot, self.UNDEFINED)
+            if not types <= entry_types:
+                entry_state[slot] = entry_types | types
+                changed = True
+        for slot in entry_state.keys() - state.keys():
+            if not self.UNDEFINED <= entry_state[slot]:
+                entry_state[slot] = entry_state[slot] | self.UNDEFINED
+                changed = True
+        return changed
+
+    # Vrátí množinu možných typů operandu symb
+    def symb_types(self, symb, state):
+        if symb[0] != "var":
+            return frozenset([symb[0]])
+        if symb[1][0] != "GF":
+            return self.ANY_TYPE
+        return state.get(symb[1][1], self.UNDEFINED)
+
+    # Upraví stav podle proměnné, do které instrukce zapisuje
+    def transfer(self, instruction, state):
+        opcode = instruction.opcode
+        if opcode in self.result_types:
+            types = self.result_types[opcode]
+        elif opcode == Opcode.MOVE or opcode == Opcode.DEFVAR_MOVE:
+            types = self.symb_types(instruction.args[1], state) - self.NOT_VALUE
+        elif opcode == Opcode.DEFVAR:
+            types = frozenset([None])
+        elif opcode == Opcode.POPS:
+            types = self.VALUE_TYPES
+        elif opcode == Opcode.READ:
+            types = frozenset([instruction.args[1], "nil"])
+        elif opcode == Opcode.INLINE_CALL:
+            for body_instruction in instruction.args[0]:
+                self.transfer(body_instruction, state)
+            return
+        elif opcode == Opcode.STACK_OPERATION:
+            self.transfer(instruction.args[1], state)
+            return
+        else:
+            return
+        var = instruction.args[0]
+        if var[0] == "GF":
+            state[var[1]] = types
+
+    # Vrátí instrukci specializovanou podle stavu před ní, nelze-li, vrátí ji beze změny
+    def specialize_instruction(self, instruction, state):
+        opcode = instruction.opcode
+        if opcode in self.operand_types:
+            expected, specialized = self.operand_types[opcode]
+            for i, symb in enumerate(instruction.args[1:]):
+                if not self.symb_types(symb, state) <= expected[i]:
+                    return instruction
+        elif opcode in self.same_types:
+            specialized = self.same_types[opcode]
+            types = self.symb_types(instruction.args[1], state) | self.symb_types(instruction.args[2], state)
+            if len(types) > 1 or types & self.NOT_COMPARABLE:
+                return instruction
+        elif opcode == Opcode.INLINE_CALL:
+            body = []
+            body_state = dict(state)
+            for body_instruction in instruction.args[0]:
+                body.append(self.specialize_instruction(body_instruction, body_state))
+                self.transfer(body_instruction, body_state)
+            return instruction._replace(args=(tuple(body),))
+        elif opcode == Opcode.STACK_OPERATION:
+            operation = self.specialize_instruction(instruction.args[1], state)
+            return instruction._replace(args=(instruction.args[0], operation))
+        else:
+            return instruction
+        return instruction._replace(opcode=specialized)
+
+
+# -----------------------------------------------------------
+# PythonCompiler
+#
+# Překládá zvalidovaný program (--compile-to) do modulu v Pythonu.
+# Program je rozdělen na bloky začínající návěštím nebo instrukcí
+# za skokem, každý blok je funkcí vracející index následujícího
+# bloku. Aritmetika, přesuny, porovnání a skoky jsou přeloženy přímo
+# včetně typových kontrol, ostatní instrukce volají obslužné metody
+# interpretu. Modul se spouští stejnými parametry jako interpret bez
+# --source a vrací stejné chybové kódy i statistiky.
+# -----------------------------------------------------------
+class PythonCompiler:
+    VERSION = 1
+    BLOCK_END = ["JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL", "RETURN", "EXIT"]
+    NUMERIC = {"ADD": "+", "SUB": "-", "MUL": "*", "IDIV": "//"}
+    VALUE_FUNCTIONS = {"LT": ("compare_value", "bool"), "GT": ("compare_value", "bool"),
+                       "EQ": ("compare_value", "bool"), "AND": ("and_or_value", "bool"),
+                       "OR": ("and_or_value", "bool"), "NOT": ("not_value", "bool"),
+                       "INT2CHAR": ("int2char_value", "string"), "STRI2INT": ("stri2int_value", "int"),
+                       "GETCHAR": ("char_value", "string")}
+    RUNTIME = ["equal_value"] + sorted(set(function for function, result_type in VALUE_FUNCTIONS.values()))
+
+    def __init__(self, interpret):
+        self.interpret = interpret
+        self.block_of = {}
+        self.temp = 0
+
+    # Přeloží program a zapíše modul do souboru path
+    def compile(self, path):
+        source = self.generate()
+        try:
+            with open(path, "w") as compiled_file:
+                compiled_file.write(source)
+        except:
+            exit(ERROR_12)
+
+    # Načte program z přeloženého modulu a připraví jeho bloky ke spuštění
+    def load(self, compiled):
+        if getattr(compiled, "COMPILER_VERSION", None) != self.VERSION:
+            exit(ERROR_99)
+        program = tuple(Instruction(Opcode(opcode), args, order) for opcode, args, order in compiled.PROGRAM)
+        self.interpret.program = program
+        self.interpret.source_program = program
+        self.interpret.frame_manager.gf = Frame(compiled.GF_SIZE)
+        compiled.bind(self.interpret)
+
+    # Vrátí zdrojový kód modulu
+    def generate(self):
+        program = self.interpret.source_program
+        starts = []
+        for i, instruction in enumerate(program):
+            if i == 0 or instruction.opcode == Opcode.LABEL or program[i - 1].opcode.name in self.BLOCK_END:
+                starts.append(i)
+        self.block_of = {start: block for block, start in enumerate(starts)}
+        self.block_of[len(program)] = len(starts)
+
+        lines = [
+            "# Vygenerováno: python3 interpret.py --compile-to",
+            "import sys",
+            "sys.path.insert(0, " + repr(os.path.dirname(os.path.abspath(__file__))) + ")",
+            "import interpret",
+            "from interpret import ERROR_53, ERROR_54, ERROR_56, ERROR_57",
+            "",
+            "COMPILER_VERSION = " + str(self.VERSION),
+            "GF_SIZE = " + str(len(self.interpret.frame_manager.gf.slots)),
+            "BLOCK_STARTS = " + self.literal(tuple(starts)),
+            "PROGRAM = (",
+        ]
+        for instruction in program:
+            lines.append("    " + self.literal((int(instruction.opcode), instruction.args, instruction.order)) + ",")
+        lines += [
+            ")",
+            "",
+            "",
+            "def bind(runtime_interpret):",
+            "    global runtime, gf, stack, call_stack, handlers, get_variable, write, " + ", ".join(self.RUNTIME),
+            "    runtime = runtime_interpret",
+            "    gf = runtime.frame_manager.gf.slots",
+            "    stack = runtime.frame_manager.stack",
+            "    call_stack = runtime.frame_manager.call_stack",
+            "    handlers = runtime.dispatch_table",
+            "    get_variable = runtime.utilities.get_variable",
+            "    write = runtime.output_sink.write",
+        ]
+        lines += ["    " + function + " = runtime." + function for function in self.RUNTIME]
+
+        for block, start in enumerate(starts):
+            end = starts[block + 1] if block + 1 < len(starts) else len(program)
+            body = []
+            for i in range(start, end):
+                body += self.instruction_code(i)
+            if program[end - 1].opcode.name not in ["JUMP", "CALL", "RETURN"]:
+                body.append("return " + str(block + 1))
+            lines += ["", "", "def block_" + str(block) + "():"] + ["    " + line for line in body]
+
+        lines += [
+            "",
+            "",
+            "BLOCKS = (" + "".join("block_" + str(block) + ", " for block in range(len(starts))) + ")",
+            "",
+            "if __name__ == '__main__':",
+            "    interpret.main(sys.modules[__name__])",
+            "",
+        ]
+        return "\n".join(lines)
+
+    # Vrátí řádky kódu jedné instrukce
+    def instruction_code(self, i):
+        instruction = self.interpret.source_program[i]
+        name = instruction.opcode.name
+        args = instruction.args
+        lines = []
+        self.temp = 0
+        if name == "LABEL":
+            pass
+        elif name == "MOVE":
+            value, v_type, const_type = self.fetch_symb(args[1], lines)
+            if const_type is None:
+                lines += ["if " + v_type + " is None:", "    exit(ERROR_56)"]
+            self.store(args[0], value, v_type, lines)
+        elif name in self.NUMERIC:
+            operands = [self.fetch_symb(args[1], lines), self.fetch_symb(args[2], lines)]
+            self.check_types(operands, "int", lines)
+            if name == "IDIV":
+                lines += ["if " + operands[1][0] + " == 0:", "    exit(ERROR_57)"]
+            lines.append("result = " + operands[0][0] + " " + self.NUMERIC[name] + " " + operands[1][0])
+            self.store(args[0], "result", "'int'", lines)
+        elif name in self.VALUE_FUNCTIONS:
+            function, result_type = self.VALUE_FUNCTIONS[name]
+            operands = [self.fetch_symb(args[1], lines, name in ["STRI2INT", "GETCHAR"])]
+            operands += [self.fetch_symb(symb, lines) for symb in args[2:]]
+            call_args = [expression for operand in operands for expression in operand[:2]]
+            if function in ["compare_value", "and_or_value"]:
+                call_args.append(repr(name))
+            lines.append("result = " + function + "(" + ", ".join(call_args) + ")")
+            self.store(args[0], "result", repr(result_type), lines)
+        elif name == "WRITE":
+            value, v_type, const_type = self.fetch_symb(args[0], lines)
+            if const_type is None:
+                lines += ["if " + v_type + " is None:", "    exit(ERROR_56)",
+                          "write(runtime.utilities.value_to_string(" + value + ", " + v_type + "))"]
+            else:
+                lines.append("write(" + repr(self.interpret.utilities.value_to_string(args[0][1], const_type)) + ")")
+        elif name == "PUSHS":
+            value, v_type, const_type = self.fetch_symb(args[0], lines)
+            if const_type is None:
+                lines += ["if " + v_type + " is None:", "    exit(ERROR_56)"]
+            lines.append("stack.push(" + value + ", " + v_type + ")")
+        elif name == "JUMP":
+            lines.append("return " + self.label_block(args[0]))
+        elif name in ["JUMPIFEQ", "JUMPIFNEQ"]:
+            operands = [self.fetch_symb(args[1], lines), self.fetch_symb(args[2], lines)]
+            condition = "equal_value(" + ", ".join(operands[0][:2] + operands[1][:2]) + ")"
+            if name == "JUMPIFNEQ":
+                condition = "not " + condition
+            lines += ["if " + condition + ":", "    return " + self.label_block(args[0])]
+        elif name in ["JUMPIFEQS", "JUMPIFNEQS"]:
+            condition = "equal_value(stack.values[i], stack.types[i], stack.values[i + 1], stack.types[i + 1])"
+            if name == "JUMPIFNEQS":
+                condition = "not " + condition
+            lines += ["i = stack.peek_operands(2)", "if " + condition + ":",
+                      "    return " + self.label_block(args[0])]
+        elif name == "CALL":
+            lines += ["call_stack.push_stack(" + str(self.block_of[i + 1]) + ")",
+                      "return " + self.label_block(args[0])]
+        elif name == "RETURN":
+            lines += ["if call_stack.top is None:", "    exit(ERROR_56)", "return call_stack.pop_stack()"]
+        else:
+            if name == "BREAK":
+                lines.append("runtime.instr_order = " + str(i))
+            call_args = ", ".join(self.literal(arg) for arg in args)
+            lines.append("handlers[" + str(int(instruction.opcode)) + "](" + call_args + ")")
+        return lines
+
+    # Vrátí index bloku začínajícího návěštím
+    def label_block(self, label):
+        return str(self.block_of[self.interpret.label_table[label]])
+
+    # Přidá řádky načítající proměnnou a vrátí jméno lokální proměnné s objektem Variable
+    def fetch_var(self, var, lines):
+        name = "v" + str(self.temp)
+        self.temp += 1
+        if var[0] == "GF":
+            lines += [name + " = gf[" + str(var[1]) + "]", "if " + name + " is None:", "    exit(ERROR_54)"]
+        else:
+            lines.append(name + " = get_variable(" + self.literal(var) + ")")
+        return name
+
+    # Vrátí výrazy pro hodnotu a typ operandu symb a typ konstanty, u proměnné None
+    # a text určuje, zda se řetězec proměnné čte jako v Utilities.get_text_data
+    def fetch_symb(self, symb, lines, text=False):
+        if symb[0] != "var":
+            return self.literal(symb[1]), repr(symb[0]), symb[0]
+        name = self.fetch_var(symb[1], lines)
+        return name + (".text()" if text else ".value"), name + ".v_type", None
+
+    # Přidá kontrolu inicializace a typu operandů, u konstant se typ ověří již při překladu
+    def check_types(self, operands, expected, lines):
+        variables = [operand[1] for operand in operands if operand[2] is None]
+        if len(variables) > 0:
+            lines += ["if " + " or ".join(v_type + " is None" for v_type in variables) + ":", "    exit(ERROR_56)"]
+        if any(operand[2] is not None and operand[2] != expected for operand in operands):
+            lines.append("exit(ERROR_53)")
+        elif len(variables) > 0:
+            lines += ["if " + " or ".join(v_type + " != " + repr(expected) for v_type in variables) + ":",
+                      "    exit(ERROR_53)"]
+
+    # Přidá uložení výsledku do proměnné
+    def store(self, var, value, v_type, lines):
+        name = self.fetch_var(var, lines)
+        lines += [name + ".value = " + value, name + ".v_type = " + v_type]
+
+    # Vrátí zápis konstanty v Pythonu, velká čísla šestnáctkově kvůli limitu počtu číslic
+    def literal(self, value):
+        if isinstance(value, tuple):
+            return "(" + "".join(self.literal(item) + ", " for item in value) + ")"
+        if isinstance(value, int) and not isinstance(value, bool) and abs(value) > 10 ** 100:
+            return hex(value)
+        return repr(value)
 
 
 # -----------------------------------------------------------
 # StatsManager
 #
-# Validuje vstupní přepínače a kontroluje zda má uživatel
-# pouštící program práva vytvářet a číst ze souborů
+# Počítá a vypisuje statistiky rozšíření STATI. Během vykonávání se
+# jen zvyšuje čítač provedení instrukce na daném indexu programu,
+# nejčastější instrukce a operační kódy se určí až na konci.
 # -----------------------------------------------------------
 class StatsManager:
     def __init__(self, interpret):
         self.interpret = interpret
-        self.instructions_opcodes = []
-        self.instructions_orders = []
+        self.execution_counts = []
+        self.partial_executions = []
         self.stats_file = None
 
-    # Spočítá statistiky
+    # Připraví čítače provedení pro každou instrukci programu
+    def start(self):
+        self.execution_counts = [0] * len(self.interpret.program)
+        return self.execution_counts
+
+    # Vrátí čítače provedení přepočtené na instrukce původního programu,
+    # instrukce optimalizovaného programu se započítá všem, ze kterých vznikla.
+    # Přičte instrukce vykonané samostatně na hranici --max-steps.
+    def source_execution_counts(self):
+        if self.interpret.origins is None:
+            execution_counts = list(self.execution_counts)
+        else:
+            execution_counts = [0] * len(self.interpret.source_program)
+            for i, count in enumerate(self.execution_counts):
+                for origin in self.interpret.origins[i]:
+                    execution_counts[origin] += count
+        for i in self.partial_executions:
+            execution_counts[i] += 1
+        return execution_counts
+
+    # Vrátí počet vykonaných instrukcí původního programu bez návěští
+    def executed_instructions(self):
+        program = self.interpret.source_program
+        execution_counts = self.source_execution_counts()
+        return sum(count for i, count in enumerate(execution_counts) if program[i].opcode != Opcode.LABEL)
+
+    # Spočítá statistiky z čítačů, --frequent vychází ze statického výskytu v programu
     def calculate_stats(self):
+        if self.stats_file is None:
+            return
+        program = self.interpret.source_program
+
+        opcode_counts = collections.Counter(instruction.opcode.name for instruction in program)
         max_opcode = []
         max_opcode_frequency = 0
         for opcode in OPCODE_REQUIREMENTS:
-            count = self.instructions_opcodes.count(opcode)
+            count = opcode_counts[opcode]
             if count == max_opcode_frequency:
                 max_opcode.append(opcode)
             elif count > max_opcode_frequency:
                 max_opcode = [opcode]
                 max_opcode_frequency = count
-        most_frequent_instruction = 0
-
-        if len(self.instructions_orders) > 0:
-            most_frequent_instruction = max(sorted(self.instructions_orders, key=lambda word: int(word)),
-                                            key=self.instructions_orders.count)
-        if self.stats_file is not None:
-            self.print_stats(most_frequent_instruction, max_opcode)
 
-    # Vypíše požadované statistiky do zadaného souboru
-    def print_stats(self, most_frequent_instruction, max_opcode):
+        executed_count = 0
+        most_frequent_instruction = 0
+        most_frequent_count = 0
+        for i, count in enumerate(self.source_execution_counts()):
+            if program[i].opcode == Opcode.LABEL:
+                continue
+            executed_count += count
+            if count > most_frequent_count:
+                most_frequent_instruction = program[i].order
+                most_frequent_count = count
+        self.print_stats(most_frequent_instruction, max_opcode, executed_count)
+
+    # Vypíše požadované statistiky do zadaného souboru, v režimu --serve
+    # je stats_file místo cesty již otevřený textový proud
+    def print_stats(self, most_frequent_instruction, max_opcode, executed_count):
         print_index = 0
-        try:
-            stats_file = open(self.stats_file, "w")
-        except:
-            exit(ERROR_12)
+        if isinstance(self.stats_file, str):
+            try:
+                stats_file = open(self.stats_file, "w")
+            except:
+                exit(ERROR_12)
+        else:
+            stats_file = self.stats_file
 
         for argument in self.interpret.arguments_validator.arguments:
             splitted = len(argument.split("="))
@@ -357,11 +1387,332 @@ class StatsManager:
                     else:
                         stats_file.write("," + j)
             if "insts" in argument and splitted == 1:
-                stats_file.write(str(len(self.instructions_orders)))
+                stats_file.write(str(executed_count))
             if "vars" in argument and splitted == 1:
                 stats_file.write(str(self.interpret.frame_manager.max_var_count))
 
 
+# -----------------------------------------------------------
+# Profiler
+#
+# Měří pro každou instrukci a každý operační kód počet provedení,
+# vlastní čas obslužné metody a kumulativní čas, který u CALL
+# zahrnuje i dobu do návratu instrukcí RETURN. Zapnutý parametrem
+# --profile=PATH, textová zpráva se zapíše do PATH a data ve formátu
+# JSON do PATH.json. Vypnutý profiler iterator nijak nezpomaluje,
+# měří se ve vlastní smyčce. U rekurze se do kumulativního času CALL
+# počítá jen nejvnějšší volání, aby se doba nezapočítala vícekrát.
+# -----------------------------------------------------------
+class Profiler:
+    REPORT_LINES = 50
+
+    def __init__(self, interpret):
+        self.interpret = interpret
+        self.profile_file = None
+        self.counts = []
+        self.self_times = []
+        self.cumulative_times = []
+
+    # Vykoná program s měřením, zprávu zapíše i při ukončení instrukcí EXIT nebo chybou
+    def profile(self):
+        interpret = self.interpret
+        program = interpret.program
+        dispatch_table = interpret.dispatch_table
+        clock = time.perf_counter_ns
+        self.counts = [0] * len(program)
+        self.self_times = [0] * len(program)
+        self.cumulative_times = [0] * len(program)
+        if interpret.stats_manager.stats_file is not None:
+            interpret.stats_manager.execution_counts = self.counts
+        calls = []
+        active_calls = collections.Counter()
+        budget = countdown = interpret.resource_governor.start()
+        try:
+            while interpret.instr_order < len(program):
+                if countdown == 0:
+                    budget = countdown = interpret.resource_governor.check(budget)
+                countdown -= 1
+                i = interpret.instr_order
+                instruction = program[i]
+                self.counts[i] += 1
+                start = clock()
+                dispatch_table[instruction.opcode](*instruction.args)
+                end = clock()
+                self.self_times[i] += end - start
+                self.cumulative_times[i] += end - start
+                if instruction.opcode == Opcode.CALL:
+                    calls.append((i, end))
+                    active_calls[i] += 1
+                elif instruction.opcode == Opcode.RETURN and len(calls) > 0:
+                    call, call_end = calls.pop()
+                    active_calls[call] -= 1
+                    if active_calls[call] == 0:
+                        self.cumulative_times[call] += end - call_end
+                interpret.instr_order += 1
+        finally:
+            self.write_report()
+
+    # Vrátí záznamy o instrukcích s návěštím bloku, ve kterém leží
+    def instruction_records(self):
+        program = self.interpret.program
+        records = []
+        label = None
+        for i, instruction in enumerate(program):
+            if instruction.opcode == Opcode.LABEL:
+                label = instruction.args[0]
+            records.append({"index": i, "order": instruction.order, "opcode": instruction.opcode.name,
+                            "label": label, "count": self.counts[i], "self_ns": self.self_times[i],
+                            "cumulative_ns": self.cumulative_times[i]})
+        return records
+
+    # Vrátí souhrnné záznamy za operační kódy
+    def opcode_records(self):
+        opcodes = {}
+        for i, instruction in enumerate(self.interpret.program):
+            record = opcodes.setdefault(instruction.opcode.name, {"opcode": instruction.opcode.name, "count": 0,
+                                                                  "self_ns": 0, "cumulative_ns": 0})
+            record["count"] += self.counts[i]
+            record["self_ns"] += self.self_times[i]
+            record["cumulative_ns"] += self.cumulative_times[i]
+        return list(opcodes.values())
+
+    # Zapíše textovou zprávu seřazenou podle vlastního času a data ve formátu JSON
+    def write_report(self):
+        instructions = sorted(self.instruction_records(), key=lambda record: record["self_ns"], reverse=True)
+        opcodes = sorted(self.opcode_records(), key=lambda record: record["self_ns"], reverse=True)
+        try:
+            report_file = open(self.profile_file, "w")
+            json_file = open(self.profile_file + ".json", "w")
+        except:
+            exit(ERROR_12)
+
+        total = sum(self.self_times)
+        report_file.write("total " + str(sum(self.counts)) + " instructions, " + str(total // 1000) + " us\n\n")
+        report_file.write("%-12s %12s %14s %14s %7s\n" % ("opcode", "count", "self us", "cumulative us", "self %"))
+        for record in opcodes:
+            report_file.write("%-12s %12d %14d %14d %6.1f%%\n" % (
+                record["opcode"], record["count"], record["self_ns"] // 1000, record["cumulative_ns"] // 1000,
+                100 * record["self_ns"] / total if total > 0 else 0))
+        report_file.write("\n%-8s %-12s %-16s %12s %14s %14s\n" % ("order", "opcode", "label", "count", "self us",
+                                                                   "cumulative us"))
+        for record in instructions[:self.REPORT_LINES]:
+            report_file.write("%-8d %-12s %-16s %12d %14d %14d\n" % (
+                record["order"], record["opcode"], "" if record["label"] is None else record["label"],
+                record["count"], record["self_ns"] // 1000, record["cumulative_ns"] // 1000))
+        report_file.close()
+
+        json.dump({"opcodes": opcodes, "instructions": instructions}, json_file, indent=1)
+        json_file.close()
+
+
+# -----------------------------------------------------------
+# ResourceGovernor
+#
+# Hlídá limity --max-steps, --timeout a --max-memory. Kroky se počítají
+# v instrukcích původního programu bez návěští stejně jako --insts,
+# instrukce sloučená optimalizací stojí tolik kroků, z kolika instrukcí
+# vznikla, a blok přeloženého programu tolik, kolik jich obsahuje.
+# Smyčka vykonávání odpočítává kroky do další kontroly a teprve po
+# CHECK_INTERVAL krocích (nebo na hranici --max-steps) zavolá check,
+# který porovná čas s termínem a paměť procesu s pamětí na začátku
+# běhu. Sloučenou instrukci nebo blok, který by hranici --max-steps
+# překročil, nahradí vykonání těch jeho instrukcí původního programu,
+# které se do limitu vejdou, program se tak zastaví na stejném místě
+# bez ohledu na --opt a --compile-to. Bez limitů iterator governor
+# vůbec nevolá. Při překročení vypíše na stderr překročený limit
+# a dosavadní spotřebu, zapíše dosud nasbírané statistiky a ukončí
+# program kódem daného limitu.
+# -----------------------------------------------------------
+class ResourceGovernor:
+    CHECK_INTERVAL = 4096
+    MIB = 1024 * 1024
+    LIMITS = ("max_steps", "timeout", "max_memory")
+
+    def __init__(self, interpret):
+        self.interpret = interpret
+        self.max_steps = None
+        self.timeout = None
+        self.max_memory = None
+        self.steps = 0
+        self.start_time = 0
+        self.memory_base = None
+        self.block_counts = None
+
+    # Nastaví limity ze slovníku s klíči LIMITS, chybějící limit je None
+    def configure(self, limits):
+        for name in self.LIMITS:
+            value = limits.get(name)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                exit(ERROR_10)
+        if isinstance(limits.get("max_steps"), float):
+            exit(ERROR_10)
+        self.max_steps = limits.get("max_steps")
+        self.timeout = limits.get("timeout")
+        self.max_memory = limits.get("max_memory")
+
+    # Vrátí limity defaults zpřísněné limity z overrides, požadavek serveru
+    # nebo případ dávky tak limity z příkazové řádky nemůže zvýšit ani zrušit
+    @staticmethod
+    def stricter_limits(defaults, overrides):
+        limits = dict(defaults)
+        for name in ResourceGovernor.LIMITS:
+            value = overrides.get(name)
+            if value is None:
+                continue
+            if limits.get(name) is None or not isinstance(value, (int, float)) or value < limits[name]:
+                limits[name] = value
+        return limits
+
+    # Vrátí True, je-li nastaven alespoň jeden limit
+    def enabled(self):
+        return self.max_steps is not None or self.timeout is not None or self.max_memory is not None
+
+    # Zahájí měření a vrátí počet instrukcí do první kontroly
+    def start(self):
+        self.steps = 0
+        self.start_time = time.monotonic()
+        if self.max_memory is not None:
+            self.memory_base = self.memory_usage()
+        return self.budget()
+
+    # Vrátí počet kroků do další kontroly, nejvýše do hranice --max-steps
+    def budget(self):
+        if self.max_steps is None:
+            return self.CHECK_INTERVAL
+        return min(self.CHECK_INTERVAL, self.max_steps - self.steps)
+
+    # Vrátí počty kroků jednotek vykonávání, units jsou pro každou jednotku
+    # indexy instrukcí původního programu, které provede
+    def unit_costs(self, units):
+        source_program = self.interpret.source_program
+        return [sum(1 for i in unit if source_program[i].opcode != Opcode.LABEL) for unit in units]
+
+    # Započítá executed vykonaných kroků a ověří limity před vykonáním další
+    # jednotky s cenou cost, která provede instrukce původního programu
+    # pending. Vrátí počet kroků do další kontroly.
+    def check(self, executed, cost, pending):
+        self.steps += executed
+        if self.max_steps is not None and self.steps + cost > self.max_steps:
+            self.run_source(pending)
+            self.limit_exceeded(ERROR_60, "--max-steps")
+        if self.timeout is not None and time.monotonic() - self.start_time > self.timeout:
+            self.limit_exceeded(ERROR_61, "--timeout")
+        if self.max_memory is not None and self.memory_base is not None and \
+                self.memory_usage() - self.memory_base > self.max_memory * self.MIB:
+            self.limit_exceeded(ERROR_62, "--max-memory")
+        return self.budget()
+
+    # Vykoná program s hlídáním limitů, se statistikami vede i čítače
+    # provedení, aby šly při překročení limitu zapsat dosavadní statistiky
+    def run(self):
+        interpret = self.interpret
+        program = interpret.program
+        dispatch_table = interpret.dispatch_table
+        units = interpret.origins
+        if units is None:
+            units = tuple((i,) for i in range(len(program)))
+        costs = self.unit_costs(units)
+        budget = countdown = self.start()
+        try:
+            if interpret.stats_manager.stats_file is None:
+                while interpret.instr_order < len(program):
+                    cost = costs[interpret.instr_order]
+                    if countdown < cost:
+                        budget = countdown = self.check(budget - countdown, cost, units[interpret.instr_order])
+                    countdown -= cost
+                    instruction = program[interpret.instr_order]
+                    dispatch_table[instruction.opcode](*instruction.args)
+                    interpret.instr_order += 1
+            else:
+                execution_counts = interpret.stats_manager.start()
+                while interpret.instr_order < len(program):
+                    cost = costs[interpret.instr_order]
+                    if countdown < cost:
+                        budget = countdown = self.check(budget - countdown, cost, units[interpret.instr_order])
+                    countdown -= cost
+                    execution_counts[interpret.instr_order] += 1
+                    instruction = program[interpret.instr_order]
+                    dispatch_table[instruction.opcode](*instruction.args)
+                    interpret.instr_order += 1
+        except MemoryError:
+            self.memory_error()
+
+    # Vykoná program přeložený --compile-to s hlídáním limitů, odpočítávají
+    # se kroky vykonaných bloků, block_counts jsou počty provedení bloků
+    def run_blocks(self, block_counts):
+        compiled = self.interpret.compiled
+        blocks = compiled.BLOCKS
+        starts = compiled.BLOCK_STARTS + (len(self.interpret.program),)
+        units = [range(starts[block], starts[block + 1]) for block in range(len(blocks))]
+        costs = self.unit_costs(units)
+        self.block_counts = block_counts
+        block = 0
+        budget = countdown = self.start()
+        try:
+            while block < len(blocks):
+                cost = costs[block]
+                if countdown < cost:
+                    budget = countdown = self.check(budget - countdown, cost, units[block])
+                block_counts[block] += 1
+                countdown -= cost
+                block = blocks[block]()
+        except MemoryError:
+            self.memory_error()
+
+    # Vykoná z instrukcí původního programu pending ty, které se ještě vejdou
+    # do --max-steps. Jsou to vždy instrukce před posledním skokem jednotky,
+    # po nich se program ukončí, na pozici ve vykonávaném programu proto
+    # nezáleží. Index instrukce se nastaví jen v přeloženém programu, jehož
+    # indexy jsou indexy původního programu, kvůli pozici ve výpisu BREAK.
+    def run_source(self, pending):
+        interpret = self.interpret
+        for i in pending:
+            instruction = interpret.source_program[i]
+            cost = 0 if instruction.opcode == Opcode.LABEL else 1
+            if self.steps + cost > self.max_steps:
+                return
+            self.steps += cost
+            interpret.stats_manager.partial_executions.append(i)
+            if interpret.origins is None:
+                interpret.instr_order = i
+            interpret.dispatch_table[instruction.opcode](*instruction.args)
+
+    # Nedostatek paměti je při zadaném --max-memory překročením limitu
+    def memory_error(self):
+        if self.max_memory is None:
+            raise MemoryError
+        self.limit_exceeded(ERROR_62, "--max-memory")
+
+    # Vrátí velikost rezidentní paměti procesu v bajtech, není-li zjistitelná,
+    # vrátí None a paměť hlídá jen zachycení MemoryError
+    def memory_usage(self):
+        try:
+            with open("/proc/self/statm", "rb") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+
+    # Vypíše překročený limit se spotřebou, zapíše dosavadní statistiky a ukončí program
+    def limit_exceeded(self, code, option):
+        interpret = self.interpret
+        frame_manager = interpret.frame_manager
+        if self.block_counts is not None:
+            interpret.store_block_counts(self.block_counts)
+        interpret.output_sink.flush()
+        memory = self.memory_usage()
+        sys.stderr.write("Překročen limit " + option + '\n')
+        sys.stderr.write("Vykonáno instrukcí: " + str(self.steps) + '\n')
+        sys.stderr.write("Doba běhu: %.3f s\n" % (time.monotonic() - self.start_time))
+        if memory is not None and self.memory_base is not None:
+            sys.stderr.write("Nárůst paměti: %.1f MiB\n" % ((memory - self.memory_base) / self.MIB))
+        sys.stderr.write("Datový zásobník: " + str(frame_manager.stack.size) + '\n')
+        sys.stderr.write("Zásobník volání: " + str(len(frame_manager.call_stack.data)) + '\n')
+        sys.stderr.write("Lokální rámce: " + str(len(frame_manager.lf_list.data)) + '\n')
+        sys.stderr.write("Živé proměnné: " + str(frame_manager.var_count) + '\n')
+        interpret.stats_manager.calculate_stats()
+        exit(code)
+
+
 # -----------------------------------------------------------
 # Utilities
 #
@@ -371,76 +1722,83 @@ class Utilities:
     def __init__(self, interpret):
         self.interpret = interpret
 
-    # Konvertuje řetězce na bool
-    def string_to_bool(self, value):
-        if value.upper() == "TRUE":
-            return True
-        if value.upper() == "FALSE":
-            return False
+    # Převede hodnotu na text pro výpis instrukcemi WRITE, DPRINT a BREAK
+    def value_to_string(self, value, v_type):
+        if v_type == "string":
+            return value
+        if v_type == "bool":
+            return "true" if value else "false"
+        if v_type == "int":
+            return str(value)
+        return ""
+
+    # Vrátí proměnnou z rámce daného dekódovaným operandem (rámec, slot, jméno)
+    def get_variable(self, var):
+        if var[0] == "GF":
+            frame = self.interpret.frame_manager.gf
+        elif var[0] == "LF":
+            frame = self.interpret.frame_manager.lf_list.top
+        else:
+            frame = self.interpret.frame_manager.tf
+        if frame is None:
+            exit(ERROR_55)
+        return frame.find_variable(var[1])
 
     # Přijme konstantu nebo proměnou a vrátí její hodnotu a typ
     def get_symb_data(self, symb):
         if symb[0] == 'var':
-            split_symb = symb[1].split('@')
-            if split_symb[0] == "GF":
-                if self.interpret.frame_manager.gf.find_variable(split_symb[1]) is None:
-                    exit(ERROR_54)
-                new_symb = self.interpret.frame_manager.gf.find_variable(split_symb[1]).value
-                v_type = self.interpret.frame_manager.gf.find_variable(split_symb[1]).v_type
-            elif split_symb[0] == "TF":
-                if self.interpret.frame_manager.tf is None:
-                    exit(ERROR_55)
-                elif self.interpret.frame_manager.tf.find_variable(split_symb[1]) is None:
-                    exit(ERROR_54)
-                new_symb = self.interpret.frame_manager.tf.find_variable(split_symb[1]).value
-                v_type = self.interpret.frame_manager.tf.find_variable(split_symb[1]).v_type
-            elif split_symb[0] == "LF":
-                if self.interpret.frame_manager.lf_list.top is None:
-                    exit(ERROR_55)
-                elif self.interpret.frame_manager.lf_list.top.find_variable(split_symb[1]) is None:
-                    exit(ERROR_54)
-                new_symb = self.interpret.frame_manager.lf_list.top.find_variable(split_symb[1]).value
-                v_type = self.interpret.frame_manager.lf_list.top.find_variable(split_symb[1]).v_type
-            else:
-                exit(ERROR_54)
+            variable = self.get_variable(symb[1])
+            new_symb = variable.value
+            v_type = variable.v_type
         else:
             v_type = symb[0]
-            if symb[1] is None:
-                new_symb = ""
-            else:
-                new_symb = symb[1]
+            new_symb = symb[1]
         return new_symb, v_type
 
+    # Jako get_symb_data, jen řetězec proměnné měněné instrukcí SETCHAR vrátí
+    # jako seznam znaků bez spojení, výsledek lze jen indexovat a měřit
+    def get_text_data(self, symb):
+        if symb[0] == 'var':
+            variable = self.get_variable(symb[1])
+            return variable.text(), variable.v_type
+        return symb[1], symb[0]
+
+    # Vrátí hodnotu operandu typově specializované instrukce, tedy konstanty
+    # nebo proměnné globálního rámce, jejíž definici dokázala TypeInference
+    def get_typed_value(self, symb):
+        if symb[0] == "var":
+            return self.interpret.frame_manager.gf.slots[symb[1][1]].value
+        return symb[1]
+
+    # Jako get_typed_value, jen řetězec čeká-li v seznamu znaků, vrátí seznam
+    def get_typed_text(self, symb):
+        if symb[0] == "var":
+            return self.interpret.frame_manager.gf.slots[symb[1][1]].text()
+        return symb[1]
+
     # Změní hodnotu proměnné na novou hodnotu
     def update_var(self, var, new_symb, new_type):
-        if var[0] == "GF":
-            if self.interpret.frame_manager.gf.find_variable(var[1]) is None:
-                exit(ERROR_54)
-            self.interpret.frame_manager.gf.find_variable(var[1]).update(new_symb, new_type)
-        elif var[0] == "TF":
-            if self.interpret.frame_manager.tf is None:
-                exit(ERROR_55)
-            elif self.interpret.frame_manager.tf.find_variable(var[1]) is None:
-                exit(ERROR_54)
-            self.interpret.frame_manager.tf.find_variable(var[1]).update(new_symb, new_type)
-        elif var[0] == "LF":
-            if self.interpret.frame_manager.lf_list.top is None:
-                exit(ERROR_55)
-            elif self.interpret.frame_manager.lf_list.top.find_variable(var[1]) is None:
-                exit(ERROR_54)
-            self.interpret.frame_manager.lf_list.top.find_variable(var[1]).update(new_symb, new_type)
+        self.get_variable(var).update(new_symb, new_type)
 
-    # Konvertuje řetězec s escape sekvencemi na prostý řetězec
+    # Konvertuje řetězec s escape sekvencemi na prostý řetězec jedním průchodem
     def convert_escaped_string(self, orig_string):
-        new_string = orig_string
-        replace_arr_len = len(re.findall(r"\\[0-9]{3}", new_string))
-        replace_arr = re.findall(r"\\[0-9]{3}", new_string)
-
-        if replace_arr_len > 0:
-            for i in range(0, replace_arr_len):
-                new_string = re.sub(r"\\[0-9]{3}", chr(int(replace_arr[i][2:])), new_string, count=1)
-
-        return new_string
+        position = orig_string.find("\\")
+        if position == -1:
+            return orig_string
+
+        parts = []
+        start = 0
+        while position != -1:
+            code = orig_string[position + 1:position + 4]
+            if len(code) == 3 and code.isascii() and code.isdigit():
+                parts.append(orig_string[start:position])
+                parts.append(chr(int(code)))
+                start = position + 4
+                position = orig_string.find("\\", start)
+            else:
+                position = orig_string.find("\\", position + 1)
+        parts.append(orig_string[start:])
+        return "".join(parts)
 
 
 # -----------------------------------------------------------
@@ -456,226 +1814,155 @@ class Interpret:
         self.arguments_validator = ArgumentsValidator(self)
         self.stats_manager = StatsManager(self)
         self.utilities = Utilities(self)
-        self.input_order = 0
+        self.output_sink = OutputSink(sys.stdout.buffer)
+        self.program_decoder = ProgramDecoder(self)
+        self.program = ()
+        self.source_program = ()
+        self.origins = None
+        self.peephole_optimizer = PeepholeOptimizer(self)
+        self.type_inference = TypeInference(self)
+        self.python_compiler = PythonCompiler(self)
+        self.profiler = Profiler(self)
+        self.resource_governor = ResourceGovernor(self)
+        self.compiled = None
+        self.label_table = {}
+        self.dispatch_table = self.build_dispatch_table()
         self.instr_order = 0
 
-    # Projde všechny XML instrukce podle pořadí order, případně skáče podle zadaných instrukcí
+    # Projde všechny dekódované instrukce podle pořadí order, případně skáče podle zadaných instrukcí
     def iterator(self):
-        while self.instr_order < len(self.arguments_validator.source_data):
-
-            args = []
-            for child_args in self.arguments_validator.source_data[self.instr_order]:
-                if child_args.text is None:
-                    args.append((child_args.attrib.get('type'), child_args.text))
-                else:
-                    args.append((child_args.attrib.get('type'), child_args.text.strip()))
-            if self.arguments_validator.source_data[self.instr_order].attrib.get('opcode').upper() != "LABEL":
-                self.stats_manager.instructions_orders.append(self.arguments_validator.source_data[self.instr_order].attrib.get('order'))
-            self.switch(self.arguments_validator.source_data[self.instr_order].attrib.get('opcode'), args, self.instr_order,
-                        self.arguments_validator.source_data[self.instr_order].attrib.get('order'))
-            self.instr_order += 1
+        if self.compiled is not None:
+            self.compiled_iterator()
+            return
+        program = self.program
+        dispatch_table = self.dispatch_table
+        if self.profiler.profile_file is not None:
+            self.profiler.profile()
+        elif self.resource_governor.enabled():
+            self.resource_governor.run()
+        elif self.stats_manager.stats_file is None:
+            while self.instr_order < len(program):
+                instruction = program[self.instr_order]
+                dispatch_table[instruction.opcode](*instruction.args)
+                self.instr_order += 1
+        else:
+            execution_counts = self.stats_manager.start()
+            while self.instr_order < len(program):
+                execution_counts[self.instr_order] += 1
+                instruction = program[self.instr_order]
+                dispatch_table[instruction.opcode](*instruction.args)
+                self.instr_order += 1
+        self.stats_manager.calculate_stats()
+
+    # Vykoná program přeložený --compile-to, každý blok vrací index dalšího
+    # bloku. Instrukce bloku se vykonají vždy všechny, počty provedení
+    # instrukcí pro statistiky proto stačí odvodit z počtů provedení bloků.
+    def compiled_iterator(self):
+        blocks = self.compiled.BLOCKS
+        block = 0
+        if self.resource_governor.enabled():
+            block_counts = [0] * len(blocks)
+            self.resource_governor.run_blocks(block_counts)
+            self.store_block_counts(block_counts)
+        elif self.stats_manager.stats_file is None:
+            while block < len(blocks):
+                block = blocks[block]()
+        else:
+            block_counts = [0] * len(blocks)
+            while block < len(blocks):
+                block_counts[block] += 1
+                block = blocks[block]()
+            self.store_block_counts(block_counts)
         self.stats_manager.calculate_stats()
 
+    # Převede počty provedení bloků přeloženého programu na čítače provedení instrukcí
+    def store_block_counts(self, block_counts):
+        execution_counts = self.stats_manager.start()
+        starts = self.compiled.BLOCK_STARTS + (len(self.program),)
+        for block, count in enumerate(block_counts):
+            execution_counts[starts[block]:starts[block + 1]] = [count] * (starts[block + 1] - starts[block])
+
     # -----------------------------------------------------------
-    # switch
+    # build_dispatch_table
     #
-    # Na základě zavolané instrukce dojde k provedení konkrétní instrukce
+    # Sestaví tabulku obslužných metod indexovanou hodnotou Opcode, každá
+    # metoda přijímá přímo dekódované operandy instrukce
     # -----------------------------------------------------------
-    def switch(self, instruction, args, instr_order, xml_order):
-        match instruction.upper():
-            case "MOVE":
-                var = args[0][1].split('@')
-                symb = args[1]
-                self.f_move(var, symb)
-            case "CREATEFRAME":
-                self.f_createframe()
-            case "PUSHFRAME":
-                self.f_pushframe()
-            case "POPFRAME":
-                self.f_popframe()
-            case "DEFVAR":
-                var = args[0][1].split('@')
-                self.f_defvar(var)
-                self.frame_manager.max_vars()
-            case "CALL":
-                label = args[0]
-                self.f_call(label, xml_order)
-            case "RETURN":
-                self.f_return()
-            case "PUSHS":
-                symb = args[0]
-                self.f_pushs(symb)
-            case "POPS":
-                var = args[0][1].split('@')
-                self.f_pops(var)
-            case "ADD":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_numeric(var, symb, symb2, "add")
-            case "SUB":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_numeric(var, symb, symb2, "sub")
-            case "MUL":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_numeric(var, symb, symb2, "mul")
-            case "IDIV":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_numeric(var, symb, symb2, "idiv")
-            case "LT":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_lt_gt_eq(var, symb, symb2, "LT")
-            case "GT":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_lt_gt_eq(var, symb, symb2, "GT")
-            case "EQ":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_lt_gt_eq(var, symb, symb2, "EQ")
-            case "AND":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_and_or_not(var, symb, symb2, "AND")
-            case "OR":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_and_or_not(var, symb, symb2, "OR")
-            case "NOT":
-                var = args[0][1].split('@')
-                symb = args[1]
-                self.f_not(var, symb)
-            case "INT2CHAR":
-                var = args[0][1].split('@')
-                symb = args[1]
-                self.f_int2char(var, symb)
-            case "STRI2INT":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_stri2int_getchar(var, symb, symb2, "STRI2INT")
-            case "READ":
-                var = args[0][1].split('@')
-                v_type = args[1]
-                self.f_read(var, v_type)
-                self.input_order += 1
-            case "WRITE":
-                symb = args[0]
-                self.f_write(symb)
-            case "CONCAT":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_concat(var, symb, symb2)
-            case "STRLEN":
-                var = args[0][1].split('@')
-                symb = args[1]
-                self.f_strlen(var, symb)
-            case "GETCHAR":
-                var = args[0][1].split('@')
-                symb = args[1]
-                symb2 = args[2]
-                self.f_stri2int_getchar(var, symb, symb2, "GETCHAR")
-            case "SETCHAR":
-                var = args[0]
-                symb = args[1]
-                symb2 = args[2]
-                self.f_setchar(var, symb, symb2)
-            case "TYPE":
-                var = args[0][1].split('@')
-                symb = args[1]
-                self.f_type(var, symb)
-            case "JUMP":
-                label = args[0]
-                self.f_jump(label, "LABEL", None)
-            case "JUMPIFEQ":
-                label = args[0]
-                symb = args[1]
-                symb2 = args[2]
-                self.f_jumpifeq(label, symb, symb2)
-            case "JUMPIFNEQ":
-                label = args[0]
-                symb = args[1]
-                symb2 = args[2]
-                self.f_jumpifneq(label, symb, symb2)
-            case "EXIT":
-                symb = args[0]
-                self.f_exit(symb)
-            case "DPRINT":
-                symb = args[0]
-                self.f_dprint(symb)
-            case "BREAK":
-                self.f_break(instr_order)
-            case "CLEARS":
-                self.frame_manager.stack.clear_stack()
-            case "ADDS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_numeric(var, symbs[0], symbs[1], "add")
-            case "SUBS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_numeric(var, symbs[0], symbs[1], "sub")
-            case "MULS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_numeric(var, symbs[0], symbs[1], "mul")
-            case "IDIVS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_numeric(var, symbs[0], symbs[1], "idiv")
-            case "LTS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_lt_gt_eq(var, symbs[0], symbs[1], "LT")
-            case "GTS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_lt_gt_eq(var, symbs[0], symbs[1], "GT")
-            case "EQS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_lt_gt_eq(var, symbs[0], symbs[1], "EQ")
-            case "ANDS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_and_or_not(var, symbs[0], symbs[1], "AND")
-            case "ORS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_and_or_not(var, symbs[0], symbs[1], "OR")
-            case "NOTS":
-                var = ["stack", "stack"]
-                symb = self.frame_manager.stack.get_top()
-                self.f_not(var, symb)
-            case "INT2CHARS":
-                var = ["stack", "stack"]
-                symb = self.frame_manager.stack.get_top()
-                self.f_int2char(var, symb)
-            case "STRI2INTS":
-                var = ["stack", "stack"]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_stri2int_getchar(var, symbs[0], symbs[1], "STRI2INT")
-            case "JUMPIFEQS":
-                label = args[0]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_jumpifeq(label, symbs[0], symbs[1])
-            case "JUMPIFNEQS":
-                label = args[0]
-                symbs = self.frame_manager.stack.get_tops()
-                self.f_jumpifneq(label, symbs[0], symbs[1])
+    def build_dispatch_table(self):
+        handlers = {
+            "MOVE": self.f_move,
+            "CREATEFRAME": self.f_createframe,
+            "PUSHFRAME": self.f_pushframe,
+            "POPFRAME": self.f_popframe,
+            "DEFVAR": self.f_defvar,
+            "CALL": self.f_call,
+            "RETURN": self.f_return,
+            "PUSHS": self.f_pushs,
+            "POPS": self.f_pops,
+            "ADD": functools.partial(self.f_numeric, oper="add"),
+            "SUB": functools.partial(self.f_numeric, oper="sub"),
+            "MUL": functools.partial(self.f_numeric, oper="mul"),
+            "IDIV": functools.partial(self.f_numeric, oper="idiv"),
+            "LT": functools.partial(self.f_lt_gt_eq, instruction="LT"),
+            "GT": functools.partial(self.f_lt_gt_eq, instruction="GT"),
+            "EQ": functools.partial(self.f_lt_gt_eq, instruction="EQ"),
+            "AND": functools.partial(self.f_and_or_not, instruction="AND"),
+            "OR": functools.partial(self.f_and_or_not, instruction="OR"),
+            "NOT": self.f_not,
+            "INT2CHAR": self.f_int2char,
+            "STRI2INT": functools.partial(self.f_stri2int_getchar, instruction="STRI2INT"),
+            "READ": self.f_read,
+            "WRITE": self.f_write,
+            "CONCAT": self.f_concat,
+            "STRLEN": self.f_strlen,
+            "GETCHAR": functools.partial(self.f_stri2int_getchar, instruction="GETCHAR"),
+            "SETCHAR": self.f_setchar,
+            "TYPE": self.f_type,
+            "LABEL": self.f_label,
+            "JUMP": self.f_jump,
+            "JUMPIFEQ": self.f_jumpifeq,
+            "JUMPIFNEQ": self.f_jumpifneq,
+            "EXIT": self.f_exit,
+            "DPRINT": self.f_dprint,
+            "BREAK": self.f_break,
+            "CLEARS": self.frame_manager.stack.clear,
+            "ADDS": functools.partial(self.f_stack_binary, self.numeric_value, "int", "add"),
+            "SUBS": functools.partial(self.f_stack_binary, self.numeric_value, "int", "sub"),
+            "MULS": functools.partial(self.f_stack_binary, self.numeric_value, "int", "mul"),
+            "IDIVS": functools.partial(self.f_stack_binary, self.numeric_value, "int", "idiv"),
+            "LTS": functools.partial(self.f_stack_binary, self.compare_value, "bool", "LT"),
+            "GTS": functools.partial(self.f_stack_binary, self.compare_value, "bool", "GT"),
+            "EQS": functools.partial(self.f_stack_binary, self.compare_value, "bool", "EQ"),
+            "ANDS": functools.partial(self.f_stack_binary, self.and_or_value, "bool", "AND"),
+            "ORS": functools.partial(self.f_stack_binary, self.and_or_value, "bool", "OR"),
+            "NOTS": functools.partial(self.f_stack_unary, self.not_value, "bool"),
+            "INT2CHARS": functools.partial(self.f_stack_unary, self.int2char_value, "string"),
+            "STRI2INTS": functools.partial(self.f_stack_binary, self.stri2int_value, "int"),
+            "JUMPIFEQS": functools.partial(self.f_stack_jump, True),
+            "JUMPIFNEQS": functools.partial(self.f_stack_jump, False),
+            "STACK_OPERATION": self.f_stack_operation,
+            "DEFVAR_MOVE": self.f_defvar_move,
+            "COMPARE_JUMP": self.f_compare_jump,
+            "INLINE_CALL": self.f_inline_call,
+            "ADD_INT": functools.partial(self.f_numeric_int, oper="add"),
+            "SUB_INT": functools.partial(self.f_numeric_int, oper="sub"),
+            "MUL_INT": functools.partial(self.f_numeric_int, oper="mul"),
+            "IDIV_INT": functools.partial(self.f_numeric_int, oper="idiv"),
+            "LT_TYPED": functools.partial(self.f_compare_typed, instruction="LT"),
+            "GT_TYPED": functools.partial(self.f_compare_typed, instruction="GT"),
+            "EQ_TYPED": functools.partial(self.f_compare_typed, instruction="EQ"),
+            "AND_BOOL": functools.partial(self.f_and_or_bool, instruction="AND"),
+            "OR_BOOL": functools.partial(self.f_and_or_bool, instruction="OR"),
+            "NOT_BOOL": self.f_not_bool,
+            "CONCAT_STR": self.f_concat_str,
+            "STRLEN_STR": self.f_strlen_str,
+            "GETCHAR_STR": functools.partial(self.f_stri2int_getchar_str, instruction="GETCHAR"),
+            "STRI2INT_STR": functools.partial(self.f_stri2int_getchar_str, instruction="STRI2INT"),
+            "JUMPIFEQ_TYPED": functools.partial(self.f_jumpif_typed, True),
+            "JUMPIFNEQ_TYPED": functools.partial(self.f_jumpif_typed, False),
+            "COMPARE_JUMP_TYPED": self.f_compare_jump_typed,
+        }
+        return [handlers[opcode.name] for opcode in Opcode]
 
     # -----------------------------------------------------------
     # Práce s rámci
@@ -683,14 +1970,9 @@ class Interpret:
     # Přidá data do již inicializované proměnné
     def f_move(self, var, symb):
         new_symb = self.utilities.get_symb_data(symb)
-        new_value = new_symb[0]
-        if new_value is None:
+        if new_symb[1] is None:
             exit(ERROR_56)
-
-        if new_symb[1] == "string":
-            new_value = self.utilities.convert_escaped_string(new_value)
-
-        self.utilities.update_var(var, new_value, new_symb[1])
+        self.utilities.update_var(var, new_symb[0], new_symb[1])
 
     # Vytvoří dočasný rámec
     def f_createframe(self):
@@ -707,308 +1989,400 @@ class Interpret:
     # Stará se o deklaraci proměnné na odpovídajícím rámci
     def f_defvar(self, var):
         if var[0] == "GF":
-            self.frame_manager.gf.add_variable(var[1])
+            self.frame_manager.gf.add_variable(var[1], var[2])
         elif var[0] == "TF":
             if self.frame_manager.tf is None:
                 exit(ERROR_55)
             else:
-                self.frame_manager.tf.add_variable(var[1])
+                self.frame_manager.tf.add_variable(var[1], var[2])
         elif var[0] == "LF":
             if self.frame_manager.lf_list.top is None:
                 exit(ERROR_55)
-            self.frame_manager.lf_list.top.add_variable(var[1])
+            self.frame_manager.lf_list.top.add_variable(var[1], var[2])
+        self.frame_manager.max_vars()
+
+    # Návěští při vykonávání nic nedělá, skoky jsou řešeny tabulkou návěští
+    def f_label(self, label):
+        pass
 
     # -----------------------------------------------------------
     # Práce se skoky
     # -----------------------------------------------------------
-    # Metoda zajistí skok na zadané návěští a uloží si adresu pro následný return
-    def f_call(self, label, xml_order):
-        self.frame_manager.call_stack.push_stack((label, xml_order))
-        self.f_jump(label, "LABEL", None)
+    # Metoda zajistí skok na zadané návěští a uloží si index instrukce CALL,
+    # za kterou se program vrátí při následném return
+    def f_call(self, label):
+        self.frame_manager.call_stack.push_stack(self.instr_order)
+        self.f_jump(label)
 
     # Metoda zajistí skok zpět na adresu ze které byl naposledy vykonán skok
     def f_return(self):
         if self.frame_manager.call_stack.top is None:
             exit(ERROR_56)
-        jump_info = self.frame_manager.call_stack.pop_stack()
-        self.f_jump(jump_info[0], "CALL", jump_info[1])
+        self.instr_order = self.frame_manager.call_stack.pop_stack()
+
+    # -----------------------------------------------------------
+    # Superinstrukce
+    # -----------------------------------------------------------
+    # DEFVAR následovaný MOVE do stejné proměnné
+    def f_defvar_move(self, var, symb):
+        self.f_defvar(var)
+        self.f_move(var, symb)
+
+    # LT/GT/EQ do proměnné následované podmíněným skokem podle této proměnné
+    # porovnané s konstantou typu bool, skáče se při výsledku jump_if
+    def f_compare_jump(self, var, symb, symb2, label, instruction, jump_if):
+        if self.f_lt_gt_eq(var, symb, symb2, instruction) == jump_if:
+            self.f_jump(label)
+
+    # Tělo krátké funkce vložené místo dvojice CALL a RETURN
+    def f_inline_call(self, body):
+        dispatch_table = self.dispatch_table
+        for instruction in body:
+            dispatch_table[instruction.opcode](*instruction.args)
+
+    # Vloží operandy symbs na zásobník a provede tříadresnou instrukci operation
+    def f_stack_operation(self, symbs, operation):
+        for symb in symbs:
+            self.f_pushs(symb)
+        self.dispatch_table[operation.opcode](*operation.args)
+
+    # -----------------------------------------------------------
+    # Typově specializované instrukce
+    #
+    # Vytváří je TypeInference tam, kde typy operandů dokázala, proto
+    # operandy čtou přímo bez kontrol typů, nil a existence proměnné.
+    # Cílová proměnná se hledá jako v obecných instrukcích a kontroly
+    # hodnot zůstávají.
+    # -----------------------------------------------------------
+    # Provede add/sub/mul/div nad operandy typu int
+    def f_numeric_int(self, var, symb, symb2, oper):
+        value_a = self.utilities.get_typed_value(symb)
+        value_b = self.utilities.get_typed_value(symb2)
+        if oper == "add":
+            new_data = value_a + value_b
+        elif oper == "sub":
+            new_data = value_a - value_b
+        elif oper == "mul":
+            new_data = value_a * value_b
+        else:
+            if value_b == 0:
+                exit(ERROR_57)
+            new_data = value_a // value_b
+        self.utilities.update_var(var, new_data, "int")
+
+    # Provede instrukci </>/= nad operandy stejného typu různého od nil
+    def f_compare_typed(self, var, symb, symb2, instruction):
+        value_a = self.utilities.get_typed_value(symb)
+        value_b = self.utilities.get_typed_value(symb2)
+        if instruction == "LT":
+            new_data = value_a < value_b
+        elif instruction == "GT":
+            new_data = value_a > value_b
+        else:
+            new_data = value_a == value_b
+        self.utilities.update_var(var, new_data, "bool")
+        return new_data
+
+    # Provede instrukci and/or nad operandy typu bool
+    def f_and_or_bool(self, var, symb, symb2, instruction):
+        value_a = self.utilities.get_typed_value(symb)
+        value_b = self.utilities.get_typed_value(symb2)
+        if instruction == "AND":
+            new_data = value_a and value_b
+        else:
+            new_data = value_a or value_b
+        self.utilities.update_var(var, new_data, "bool")
+
+    # Provede negaci operandu typu bool
+    def f_not_bool(self, var, symb):
+        self.utilities.update_var(var, not self.utilities.get_typed_value(symb), "bool")
+
+    # Spojí dva řetězce, je-li cílem první operand, druhý se k němu jen připojí
+    def f_concat_str(self, var, symb, symb2):
+        if symb[0] == "var" and symb[1] == var:
+            self.frame_manager.gf.slots[var[1]].append(self.utilities.get_typed_value(symb2))
+            return
+        new_data = self.utilities.get_typed_value(symb) + self.utilities.get_typed_value(symb2)
+        self.utilities.update_var(var, new_data, "string")
+
+    # Vrátí délku řetězce
+    def f_strlen_str(self, var, symb):
+        self.utilities.update_var(var, len(self.utilities.get_typed_text(symb)), "int")
+
+    # Provede instrukci stri2int nebo getchar nad řetězcem a pozicí typu int
+    def f_stri2int_getchar_str(self, var, symb, symb2, instruction):
+        string = self.utilities.get_typed_text(symb)
+        position = self.utilities.get_typed_value(symb2)
+        if position < 0 or len(string) <= position:
+            exit(ERROR_58)
+        if instruction == "GETCHAR":
+            self.utilities.update_var(var, string[position], "string")
+        else:
+            self.utilities.update_var(var, ord(string[position]), "int")
+
+    # Podmíněný skok nad operandy stejného typu různého od nil, skáče se
+    # při rovnosti operandů rovné jump_if
+    def f_jumpif_typed(self, jump_if, label, symb, symb2):
+        if (self.utilities.get_typed_value(symb) == self.utilities.get_typed_value(symb2)) == jump_if:
+            self.f_jump(label)
+
+    # COMPARE_JUMP nad operandy stejného typu různého od nil
+    def f_compare_jump_typed(self, var, symb, symb2, label, instruction, jump_if):
+        if self.f_compare_typed(var, symb, symb2, instruction) == jump_if:
+            self.f_jump(label)
 
     # -----------------------------------------------------------
     # Práce s datovým zásobníkem
     # -----------------------------------------------------------
+    # Provede binární zásobníkovou instrukci, operandy čte přímo z polí
+    # zásobníku a nechává je na něm, výsledek výpočtu compute přidá na vrchol
+    def f_stack_binary(self, compute, result_type, *oper):
+        stack = self.frame_manager.stack
+        i = stack.peek_operands(2)
+        values = stack.values
+        types = stack.types
+        stack.push(compute(values[i], types[i], values[i + 1], types[i + 1], *oper), result_type)
+
+    # Provede unární zásobníkovou instrukci, výsledek je uložen zpět na zásobník
+    def f_stack_unary(self, compute, result_type):
+        stack = self.frame_manager.stack
+        i = stack.peek_operands(1)
+        stack.push(compute(stack.values[i], stack.types[i]), result_type)
+
+    # Provede zásobníkový podmíněný skok, skáče se při rovnosti operandů rovné jump_if
+    def f_stack_jump(self, jump_if, label):
+        stack = self.frame_manager.stack
+        i = stack.peek_operands(2)
+        values = stack.values
+        types = stack.types
+        if self.equal_value(values[i], types[i], values[i + 1], types[i + 1]) == jump_if:
+            self.f_jump(label)
+
     # Přidá proměnnou do zásobníku
     def f_pushs(self, symb):
         new_symb = self.utilities.get_symb_data(symb)
-        if new_symb[0] is None:
+        if new_symb[1] is None:
             exit(ERROR_56)
-        self.frame_manager.stack.push_stack([new_symb[1], new_symb[0]])
+        self.frame_manager.stack.push(new_symb[0], new_symb[1])
 
     # Vymaže proměnnou ze zásobníku
     def f_pops(self, var):
-        if self.frame_manager.stack.top is None:
-            exit(ERROR_56)
-        new_data = self.frame_manager.stack.pop_stack()
-        self.utilities.update_var(var, new_data[1], new_data[0])
+        stack = self.frame_manager.stack
+        i = stack.pop_operands(1)
+        self.utilities.update_var(var, stack.values[i], stack.types[i])
 
     # -----------------------------------------------------------
     # Aritmetické, relační, booleovské a konverzní instrukce
+    #
+    # Výpočet je oddělen od čtení operandů, aby ho sdílely tříadresné
+    # i zásobníkové varianty instrukcí
     # -----------------------------------------------------------
     # Provede instrukci add/sub/mul/div, podle zadané hodnoty oper
     def f_numeric(self, var, symb, symb2, oper):
         new_symb1 = self.utilities.get_symb_data(symb)
         new_symb2 = self.utilities.get_symb_data(symb2)
+        new_data = self.numeric_value(new_symb1[0], new_symb1[1], new_symb2[0], new_symb2[1], oper)
+        self.utilities.update_var(var, new_data, "int")
 
-        if new_symb1[0] is None or new_symb2[0] is None:
+    # Spočítá výsledek instrukce add/sub/mul/div
+    def numeric_value(self, value_a, type_a, value_b, type_b, oper):
+        if type_a is None or type_b is None:
             exit(ERROR_56)
-        if new_symb1[1] != "int" or new_symb2[1] != "int":
+        if type_a != "int" or type_b != "int":
             exit(ERROR_53)
 
-        if new_symb1[0][0] in ["+", "-"]:
-            if not (new_symb1[0][1:].isdigit()):
-                exit(ERROR_32)
-        elif not (new_symb1[0].isdigit()):
-            exit(ERROR_32)
-
-        if new_symb2[0][0] in ["+", "-"]:
-            if not (new_symb2[0][1:].isdigit()):
-                exit(ERROR_32)
-        elif not (new_symb2[0].isdigit()):
-            exit(ERROR_32)
-
         if oper == "add":
-            new_data = int(new_symb1[0]) + int(new_symb2[0])
+            return value_a + value_b
         elif oper == "sub":
-            new_data = int(new_symb1[0]) - int(new_symb2[0])
+            return value_a - value_b
         elif oper == "mul":
-            new_data = int(new_symb1[0]) * int(new_symb2[0])
+            return value_a * value_b
         elif oper == "idiv":
-            if int(new_symb2[0]) == 0:
+            if value_b == 0:
                 exit(ERROR_57)
-            else:
-                new_data = int(new_symb1[0]) // int(new_symb2[0])
-        else:
-            exit(ERROR_99)
-
-        if var[0] == "stack":
-            self.frame_manager.stack.push_stack(["int", str(new_data)])
-        else:
-            self.utilities.update_var(var, str(new_data), "int")
+            return value_a // value_b
+        exit(ERROR_99)
 
     # Provede instrukci </>/=, podle zadané hodnoty instruction
     def f_lt_gt_eq(self, var, symb, symb2, instruction):
         new_symb1 = self.utilities.get_symb_data(symb)
         new_symb2 = self.utilities.get_symb_data(symb2)
-        value_a = new_symb1[0]
-        value_b = new_symb2[0]
+        new_data = self.compare_value(new_symb1[0], new_symb1[1], new_symb2[0], new_symb2[1], instruction)
+        self.utilities.update_var(var, new_data, "bool")
+        return new_data
 
-        if value_a is None or value_b is None:
+    # Spočítá výsledek instrukce </>/=
+    def compare_value(self, value_a, type_a, value_b, type_b, instruction):
+        if type_a is None or type_b is None:
             exit(ERROR_56)
 
-        if new_symb1[1] == "nil" or new_symb2[1] == "nil":
+        if type_a == "nil" or type_b == "nil":
             if instruction in ["LT", "GT"]:
                 exit(ERROR_53)
-        elif new_symb1[1] != new_symb2[1]:
+            value_a = type_a
+            value_b = type_b
+        elif type_a != type_b:
             exit(ERROR_53)
-        else:
-            if new_symb1[1] == "bool":
-                value_a = self.utilities.string_to_bool(value_a)
-                value_b = self.utilities.string_to_bool(value_b)
-            elif new_symb1[1] == "int":
-                value_a = int(value_a)
-                value_b = int(value_b)
-            elif new_symb1[1] == "string":
-                value_a = self.utilities.convert_escaped_string(value_a)
-                value_b = self.utilities.convert_escaped_string(value_b)
 
         if instruction == "LT":
-            new_data = value_a < value_b
+            return value_a < value_b
         elif instruction == "GT":
-            new_data = value_a > value_b
-        else:
-            new_data = value_a == value_b
-
-        if var[0] == "stack":
-            self.frame_manager.stack.push_stack(["bool", str(new_data).lower()])
-        else:
-            self.utilities.update_var(var, str(new_data).lower(), "bool")
+            return value_a > value_b
+        return value_a == value_b
 
     # Provede instrukci and/or, podle zadané hodnoty instruction
     def f_and_or_not(self, var, symb, symb2, instruction):
         new_symb1 = self.utilities.get_symb_data(symb)
         new_symb2 = self.utilities.get_symb_data(symb2)
+        new_data = self.and_or_value(new_symb1[0], new_symb1[1], new_symb2[0], new_symb2[1], instruction)
+        self.utilities.update_var(var, new_data, "bool")
 
-        if new_symb1[0] is None or new_symb2[0] is None:
+    # Spočítá výsledek instrukce and/or
+    def and_or_value(self, value_a, type_a, value_b, type_b, instruction):
+        if type_a is None or type_b is None:
             exit(ERROR_56)
-        if new_symb1[1] != "bool" or new_symb2[1] != "bool":
+        if type_a != "bool" or type_b != "bool":
             exit(ERROR_53)
         if instruction == "AND":
-            new_data = self.utilities.string_to_bool(new_symb1[0]) and self.utilities.string_to_bool(new_symb2[0])
-        else:
-            new_data = self.utilities.string_to_bool(new_symb1[0]) or self.utilities.string_to_bool(new_symb2[0])
-
-        if var[0] == "stack":
-            self.frame_manager.stack.push_stack(["bool", str(new_data).lower()])
-        else:
-            self.utilities.update_var(var, str(new_data).lower(), "bool")
+            return value_a and value_b
+        return value_a or value_b
 
     # Provede negaci
     def f_not(self, var, symb):
-        new_symb1 = self.utilities.get_symb_data(symb)
+        new_symb = self.utilities.get_symb_data(symb)
+        self.utilities.update_var(var, self.not_value(new_symb[0], new_symb[1]), "bool")
 
-        if new_symb1[0] is None:
+    # Spočítá negaci
+    def not_value(self, value, v_type):
+        if v_type is None:
             exit(ERROR_56)
-        if new_symb1[1] != "bool":
+        if v_type != "bool":
             exit(ERROR_53)
-        new_data = not self.utilities.string_to_bool(new_symb1[0])
-
-        if var[0] == "stack":
-            self.frame_manager.stack.push_stack(["bool", str(new_data).lower()])
-        else:
-            self.utilities.update_var(var, str(new_data).lower(), "bool")
+        return not value
 
     # Převede číslo na písmeno odpovídající jeho ASCII hodnotě
     def f_int2char(self, var, symb):
         new_symb = self.utilities.get_symb_data(symb)
+        self.utilities.update_var(var, self.int2char_value(new_symb[0], new_symb[1]), "string")
 
-        if new_symb[0] is None:
+    # Spočítá výsledek instrukce int2char
+    def int2char_value(self, value, v_type):
+        if v_type is None:
             exit(ERROR_56)
-        if new_symb[1] != "int":
+        if v_type != "int":
             exit(ERROR_53)
         try:
-            new_data = chr(int(new_symb[0]))
+            return chr(value)
         except:
             exit(ERROR_58)
 
-        if var[0] == "stack":
-            self.frame_manager.stack.push_stack(["string", str(new_data)])
-        else:
-            self.utilities.update_var(var, str(new_data), "string")
-
     # Provede instrukci stri2int nebo getchar dle zadané hodnoty instruction
     def f_stri2int_getchar(self, var, symb, symb2, instruction):
-        string_base = self.utilities.get_symb_data(symb)
+        string_base = self.utilities.get_text_data(symb)
         position = self.utilities.get_symb_data(symb2)
-        if position[0] is None or string_base[0] is None:
+        if instruction == "GETCHAR":
+            new_data = self.char_value(string_base[0], string_base[1], position[0], position[1])
+            self.utilities.update_var(var, new_data, "string")
+        else:
+            new_data = self.stri2int_value(string_base[0], string_base[1], position[0], position[1])
+            self.utilities.update_var(var, new_data, "int")
+
+    # Vrátí znak řetězce na zadané pozici
+    def char_value(self, string, s_type, position, p_type):
+        if p_type is None or s_type is None:
             exit(ERROR_56)
-        if position[0][0] == "-":
-            exit(ERROR_58)
-        if position[1] != "int" or string_base[1] != "string" or not (position[0].isnumeric()):
+        if p_type != "int" or s_type != "string":
             exit(ERROR_53)
-        if len(string_base[0]) <= int(position[0]):
+        if position < 0 or len(string) <= position:
             exit(ERROR_58)
+        return string[position]
 
-        new_base = self.utilities.convert_escaped_string(string_base[0])
-
-        for i in range(0, len(new_base)):
-            if i == int(position[0]):
-                if instruction == "GETCHAR":
-                    self.utilities.update_var(var, str(new_base[i]), "string")
-                elif instruction == "STRI2INT":
-                    new_data = ord(new_base[i])
-                    if var[0] == "stack":
-                        self.frame_manager.stack.push_stack(["int", str(new_data)])
-                    else:
-                        self.utilities.update_var(var, str(new_data), "int")
-                break
+    # Spočítá výsledek instrukce stri2int
+    def stri2int_value(self, string, s_type, position, p_type):
+        return ord(self.char_value(string, s_type, position, p_type))
 
     # -----------------------------------------------------------
     # Vstupně-výstupní instrukce
     # -----------------------------------------------------------
     # Metoda načítá data ze vstupu
     def f_read(self, var, v_type):
-        new_data = self.arguments_validator.input_data
-        try:
-            test = new_data[self.input_order]
-        except:
-            self.utilities.update_var(var, "nil", "nil")
-            return
-        if new_data[self.input_order] is None:
-            self.utilities.update_var(var, "nil", "nil")
-        elif v_type[1] == "int":
-            if new_data[self.input_order][0] in ["+", "-"]:
-                if not (new_data[self.input_order][1:].isdigit()):
-                    self.utilities.update_var(var, "nil", "nil")
-                else:
-                    self.utilities.update_var(var, new_data[self.input_order], "int")
-            elif not (new_data[self.input_order].isdigit()):
-                self.utilities.update_var(var, "nil", "nil")
+        line = self.arguments_validator.input_reader.read_line()
+        if line is None:
+            self.utilities.update_var(var, None, "nil")
+        elif v_type == "int":
+            if line[:1] in ["+", "-"]:
+                digits = line[1:]
             else:
-                self.utilities.update_var(var, new_data[self.input_order], "int")
-        elif v_type[1] == "bool":
-            if new_data[self.input_order].upper() == "TRUE":
-                self.utilities.update_var(var, "true", "bool")
+                digits = line
+            if not (digits.isdecimal()):
+                self.utilities.update_var(var, None, "nil")
             else:
-                self.utilities.update_var(var, "false", "bool")
-        elif v_type[1] == "string":
-            converted_data = self.utilities.convert_escaped_string(new_data[self.input_order])
+                self.utilities.update_var(var, int(line), "int")
+        elif v_type == "bool":
+            self.utilities.update_var(var, line.upper() == "TRUE", "bool")
+        elif v_type == "string":
+            converted_data = self.utilities.convert_escaped_string(line)
             self.utilities.update_var(var, converted_data, "string")
         else:
-            self.utilities.update_var(var, "nil", "nil")
+            self.utilities.update_var(var, None, "nil")
 
     # Metoda vypíše na standartní výstup obsah zadané proměnné
     def f_write(self, symb):
         new_symb = self.utilities.get_symb_data(symb)
-        if new_symb[0] is None:
+        if new_symb[1] is None:
             exit(ERROR_56)
-        if new_symb[1] == "string":
-            print(self.utilities.convert_escaped_string(new_symb[0]), end="")
-        elif new_symb[0] == "nil" and new_symb[1] == "nil":
-            print("", end="")
-        else:
-            print(new_symb[0], end="")
+        self.output_sink.write(self.utilities.value_to_string(new_symb[0], new_symb[1]))
 
     # -----------------------------------------------------------
     # Práce s řetězci
     # -----------------------------------------------------------
-    # Spojí dva řetězce dohromady
+    # Spojí dva řetězce dohromady, je-li cílem první operand, druhý se k němu jen připojí
     def f_concat(self, var, symb, symb2):
+        if symb[0] == "var" and symb[1] == var:
+            variable = self.utilities.get_variable(var)
+            new_symb2 = self.utilities.get_symb_data(symb2)
+            if variable.v_type is None or new_symb2[1] is None:
+                exit(ERROR_56)
+            if variable.v_type != "string" or new_symb2[1] != "string":
+                exit(ERROR_53)
+            variable.append(new_symb2[0])
+            return
         new_symb1 = self.utilities.get_symb_data(symb)
         new_symb2 = self.utilities.get_symb_data(symb2)
-        if new_symb1[0] is None or new_symb2[0] is None:
+        if new_symb1[1] is None or new_symb2[1] is None:
             exit(ERROR_56)
         if new_symb1[1] != "string" or new_symb2[1] != "string":
             exit(ERROR_53)
-        converted_string1 = self.utilities.convert_escaped_string(new_symb1[0])
-        converted_string2 = self.utilities.convert_escaped_string(new_symb2[0])
-        new_data = converted_string1 + converted_string2
-        self.utilities.update_var(var, str(new_data), "string")
+        new_data = new_symb1[0] + new_symb2[0]
+        self.utilities.update_var(var, new_data, "string")
 
     # Vrátí délku vstupního řetězce
     def f_strlen(self, var, symb):
-        new_symb = self.utilities.get_symb_data(symb)
-        if new_symb[0] is None:
+        new_symb = self.utilities.get_text_data(symb)
+        if new_symb[1] is None:
             exit(ERROR_56)
         if new_symb[1] != "string":
             exit(ERROR_53)
-        converted_string = self.utilities.convert_escaped_string(new_symb[0])
-        new_data = len(converted_string)
-        self.utilities.update_var(var, str(new_data), "int")
+        new_data = len(new_symb[0])
+        self.utilities.update_var(var, new_data, "int")
 
     # Změní hodnotu proměnné nahrazením konkrétního znaku jiným
     def f_setchar(self, var, symb, symb2):
-        variable = var[1].split('@')
-        old_data = self.utilities.get_symb_data(var)
+        variable = self.utilities.get_variable(var)
         position = self.utilities.get_symb_data(symb)
         new_symbol = self.utilities.get_symb_data(symb2)
-        if position[0] is None or new_symbol[0] is None or old_data[0] is None:
+        if position[1] is None or new_symbol[1] is None or variable.v_type is None:
             exit(ERROR_56)
-        if old_data[0] == "" or new_symbol[0] == "":
-            exit(ERROR_58)
-        if position[1] != "int" or new_symbol[1] != "string" or old_data[1] != "string":
+        if position[1] != "int" or new_symbol[1] != "string" or variable.v_type != "string":
             exit(ERROR_53)
 
-        if position[0][0] == "-":
+        new_character = new_symbol[0]
+        if new_character == "":
             exit(ERROR_58)
-        if len(old_data[0]) <= int(position[0]):
+        position = position[0]
+        if position < 0 or len(variable.text()) <= position:
             exit(ERROR_58)
-
-        position = int(position[0])
-        new_character = self.utilities.convert_escaped_string(new_symbol[0])[0]
-        for i in range(0, len(old_data[0])):
-            if i == position:
-                new_data = old_data[0][:position] + new_character + old_data[0][position + 1:]
-                self.utilities.update_var(variable, str(new_data), "string")
-                break
+        variable.set_char(position, new_character[0])
 
     # -----------------------------------------------------------
     # Práce s typy
@@ -1016,68 +2390,42 @@ class Interpret:
     # Uloží typ proměnné
     def f_type(self, var, symb):
         new_symb = self.utilities.get_symb_data(symb)
-        if new_symb[0] is None:
+        if new_symb[1] is None:
             new_data = ""
         else:
             new_data = new_symb[1]
-        self.utilities.update_var(var, str(new_data), "string")
+        self.utilities.update_var(var, new_data, "string")
 
     # -----------------------------------------------------------
     # Práce se skoky
     # -----------------------------------------------------------
-    # Provede skok na zadané návěští
-    def f_jump(self, label, action, condition):
-        for i, instruction in enumerate(self.arguments_validator.source_data):
-            if instruction.attrib.get("opcode").upper() == action and instruction.find('arg1').text.strip() == label[1] \
-                    and (condition is None or condition == instruction.attrib.get("order")):
-                self.instr_order = i
-                return
-        exit(ERROR_52)
+    # Provede skok na zadané návěští, existence návěští je ověřena již při načtení programu
+    def f_jump(self, label):
+        self.instr_order = self.label_table[label]
 
     # Provede podmíněný skok na zadané návěští pouze splňuje-li podmínku
     def f_jumpifeq(self, label, symb, symb2):
         new_symb1 = self.utilities.get_symb_data(symb)
         new_symb2 = self.utilities.get_symb_data(symb2)
-        converted_symb1 = new_symb1[0]
-        converted_symb2 = new_symb2[0]
-        if new_symb1[0] is None or new_symb2[0] is None:
-            exit(ERROR_56)
-        if new_symb1[1] == "string":
-            converted_symb1 = self.utilities.convert_escaped_string(new_symb1[0])
-        if new_symb2[1] == "string":
-            converted_symb2 = self.utilities.convert_escaped_string(new_symb2[0])
-        if new_symb1[1] == "nil" or new_symb2[1] == "nil":
-            if converted_symb1 == converted_symb2:
-                self.f_jump(label, "LABEL", None)
-        elif new_symb1[1] != new_symb2[1]:
-            exit(ERROR_53)
-        elif label[1] not in self.xml_validator.labels:
-            exit(ERROR_52)
-        elif converted_symb1 == converted_symb2:
-            self.f_jump(label, "LABEL", None)
+        if self.equal_value(new_symb1[0], new_symb1[1], new_symb2[0], new_symb2[1]):
+            self.f_jump(label)
 
     # Provede podmíněný skok na zadané návěští pouze nesplňuje-li podmínku
     def f_jumpifneq(self, label, symb, symb2):
         new_symb1 = self.utilities.get_symb_data(symb)
         new_symb2 = self.utilities.get_symb_data(symb2)
-        converted_symb1 = new_symb1[0]
-        converted_symb2 = new_symb2[0]
+        if not self.equal_value(new_symb1[0], new_symb1[1], new_symb2[0], new_symb2[1]):
+            self.f_jump(label)
 
-        if new_symb1[0] is None or new_symb2[0] is None:
+    # Porovná operandy podmíněného skoku, nil lze porovnat s čímkoliv
+    def equal_value(self, value_a, type_a, value_b, type_b):
+        if type_a is None or type_b is None:
             exit(ERROR_56)
-        if new_symb1[1] == "string":
-            converted_symb1 = self.utilities.convert_escaped_string(new_symb1[0])
-        if new_symb2[1] == "string":
-            converted_symb2 = self.utilities.convert_escaped_string(new_symb2[0])
-        if new_symb1[1] == "nil" or new_symb2[1] == "nil":
-            if converted_symb1 != converted_symb2:
-                self.f_jump(label, "LABEL", None)
-        elif new_symb1[1] != new_symb2[1]:
+        if type_a == "nil" or type_b == "nil":
+            return type_a == type_b
+        elif type_a != type_b:
             exit(ERROR_53)
-        elif label[1] not in self.xml_validator.labels:
-            exit(ERROR_52)
-        elif converted_symb1 != converted_symb2:
-            self.f_jump(label, "LABEL", None)
+        return value_a == value_b
 
     # -----------------------------------------------------------
     # Předčasné ukončení programu
@@ -1085,18 +2433,14 @@ class Interpret:
     # Ukončí program se zadanou návratovou hodnotou v rozmezí 0-49
     def f_exit(self, symb):
         new_symb = self.utilities.get_symb_data(symb)
-        if new_symb[0] is None:
+        if new_symb[1] is None:
             exit(ERROR_56)
         if new_symb[1] != "int":
             exit(ERROR_53)
-        if new_symb[0][0] in ["+", "-"]:
-            if not (new_symb[0][1:].isdigit()):
-                exit(ERROR_57)
-        elif not (new_symb[0].isdigit()):
-            exit(ERROR_57)
-        if int(new_symb[0]) > 49 or int(new_symb[0]) < 0:
+        if new_symb[0] > 49 or new_symb[0] < 0:
             exit(ERROR_57)
-        exit(int(new_symb[0]))
+        self.output_sink.flush()
+        exit(new_symb[0])
 
     # -----------------------------------------------------------
     # Ladící instrukce
@@ -1104,46 +2448,54 @@ class Interpret:
     # Vypíše zadaná data na stderr
     def f_dprint(self, symb):
         new_symb1 = self.utilities.get_symb_data(symb)
-        data_out = new_symb1[0]
-        if new_symb1[1] == "string":
-            data_out = self.utilities.convert_escaped_string(new_symb1[0])
-        sys.stderr.write(data_out)
+        self.output_sink.flush()
+        sys.stderr.write(self.utilities.value_to_string(new_symb1[0], new_symb1[1]))
 
     # Vypíše ladící informace
-    def f_break(self, instr_order):
-        sys.stderr.write("Pozice instrukce: " + str(instr_order) + '\n')
+    def f_break(self):
+        self.output_sink.flush()
+        position = self.instr_order
+        if self.origins is not None:
+            position = self.origins[position][0]
+        sys.stderr.write("Pozice instrukce: " + str(position) + '\n')
         sys.stderr.write("Obsah GF: " + '\n')
-        for var in self.frame_manager.gf.variable_list:
-            sys.stderr.write(var.name + "|" + var.v_type + "|" + var.value + '\n')
+        self.break_frame(self.frame_manager.gf)
         sys.stderr.write("Obsah LF: " + '\n')
         if not (self.frame_manager.lf_list.top is None):
-            for var in self.frame_manager.lf_list.top.variable_list:
-                sys.stderr.write(var.name + "|" + var.v_type + "|" + var.value + '\n')
+            self.break_frame(self.frame_manager.lf_list.top)
         sys.stderr.write("Obsah TF: " + '\n')
         if not (self.frame_manager.tf is None):
-            for var in self.frame_manager.tf.variable_list:
-                sys.stderr.write(var.name + "|" + var.v_type + "|" + var.value + '\n')
+            self.break_frame(self.frame_manager.tf)
+
+    # Vypíše proměnné jednoho rámce ve tvaru jméno|typ|hodnota
+    def break_frame(self, frame):
+        for var in frame.variables:
+            v_type = "" if var.v_type is None else var.v_type
+            sys.stderr.write(var.name + "|" + v_type + "|" + self.utilities.value_to_string(var.value, var.v_type) + '\n')
 
 
 # -----------------------------------------------------------
 # FrameManager
 #
-# Zajištuje obsluhu a práci s rámcí
+# Zajištuje obsluhu a práci s rámcí, průběžně udržuje počet
+# proměnných ve všech dostupných rámcích pro statistiku --vars
 # -----------------------------------------------------------
 class FrameManager:
     def __init__(self):
         self.gf = Frame()
         self.lf_list = Stack()
         self.tf = None
-        self.stack = Stack()
+        self.stack = OperandStack()
         self.call_stack = Stack()
+        self.var_count = 0
         self.max_var_count = 0
 
-    # Vymaže lokální rámec ze zásobníku
+    # Vymaže lokální rámec ze zásobníku, dosavadní dočasný rámec zaniká
     def pop_lf(self):
         if self.lf_list.top is None:
             exit(ERROR_55)
         else:
+            self.discard_tf()
             self.tf = self.lf_list.top
             self.lf_list.pop_stack()
 
@@ -1154,68 +2506,153 @@ class FrameManager:
         self.lf_list.push_stack(self.tf)
         self.tf = None
 
-    # Vytvoří nový lokální rámec
+    # Vytvoří nový dočasný rámec, dosavadní dočasný rámec zaniká
     def create_tf(self):
-        self.tf = Frame()
+        self.discard_tf()
+        self.tf = LocalFrame()
 
-    # Určí zda je momenálně více proměných než je maximum
-    def max_vars(self):
-        count = self.count_variables()
-        if count > self.max_var_count:
-            self.max_var_count = count
-
-    # Spočítá počet proměných ve všech rámcích
-    def count_variables(self):
-        count = self.gf.var_count
+    # Odečte proměnné zanikajícího dočasného rámce od počtu živých proměnných
+    def discard_tf(self):
         if self.tf is not None:
-            count += self.tf.var_count
-        for frame in self.lf_list.data:
-            count += frame.var_count
-        return count
+            self.var_count -= self.tf.var_count
+
+    # Započítá nově definovanou proměnnou a případně zvýší maximum
+    def max_vars(self):
+        self.var_count += 1
+        if self.var_count > self.max_var_count:
+            self.max_var_count = self.var_count
 
 
 # -----------------------------------------------------------
 # Frame
 #
-# Rámec a jeho funkcionalita
+# Rámec a jeho funkcionalita. Proměnné globálního rámce jsou uloženy
+# ve vektoru slotů přidělených při načtení programu a předem
+# alokovaném, prázdný slot značí nedefinovanou proměnnou.
 # -----------------------------------------------------------
 class Frame:
-    def __init__(self):
-        self.variable_list = []
+    def __init__(self, size=0):
+        self.slots = [None] * size
+        self.variables = []
         self.var_count = 0
 
-    # Přidá proměnnou do rámce
-    def add_variable(self, name):
-        for var in self.variable_list:
-            if var.name == name:
-                exit(ERROR_52)
-        self.variable_list.append(Variable(name))
+    # Přidá proměnnou do rámce, seznam variables zachovává pořadí definice pro výpis BREAK
+    def add_variable(self, slot, name):
+        if slot >= len(self.slots):
+            self.slots.extend([None] * (slot + 1 - len(self.slots)))
+        elif self.slots[slot] is not None:
+            exit(ERROR_52)
+        variable = Variable(name)
+        self.slots[slot] = variable
+        self.variables.append(variable)
         self.var_count += 1
 
-    # Najde proměnnou v rámci
-    def find_variable(self, key):
-        for var in self.variable_list:
-            if var.name == key:
-                return var
-        exit(ERROR_54)
+    # Najde proměnnou v rámci podle jejího slotu
+    def find_variable(self, slot):
+        try:
+            variable = self.slots[slot]
+        except IndexError:
+            exit(ERROR_54)
+        if variable is None:
+            exit(ERROR_54)
+        return variable
+
+
+# -----------------------------------------------------------
+# LocalFrame
+#
+# Lokální a dočasný rámec. Sloty LF a TF jsou číslované společně
+# pro celý program, proto rámec drží jen své proměnné ve slovníku
+# podle slotu a jeho velikost nezávisí na počtu lokálních jmen v programu.
+# -----------------------------------------------------------
+class LocalFrame(Frame):
+    def __init__(self):
+        super().__init__()
+        self.slots = {}
+
+    # Přidá proměnnou do rámce, seznam variables zachovává pořadí definice pro výpis BREAK
+    def add_variable(self, slot, name):
+        if slot in self.slots:
+            exit(ERROR_52)
+        variable = Variable(name)
+        self.slots[slot] = variable
+        self.variables.append(variable)
+        self.var_count += 1
+
+    # Najde proměnnou v rámci podle jejího slotu
+    def find_variable(self, slot):
+        try:
+            return self.slots[slot]
+        except KeyError:
+            exit(ERROR_54)
 
 
 # -----------------------------------------------------------
 # Variable
 #
-# Atributy a funkcionalita proměnné
+# Atributy a funkcionalita proměnné. Řetězec, ke kterému se opakovaně
+# připojuje instrukcí CONCAT, se drží jako seznam částí parts a atribut
+# value se odstraní. Spojí se až při prvním čtení value v __getattr__
+# a výsledek zůstane uložený do dalšího připojení. Běžné čtení value
+# tak nic nestojí a připojení je amortizovaně O(1).
+# Řetězec měněný instrukcí SETCHAR se obdobně převede na měnitelný
+# seznam znaků chars, GETCHAR, STRI2INT a STRLEN čtou přímo z něj.
+# Po spojení si proměnná pamatuje výsledný řetězec v chars_value,
+# dokud se hodnota nezmění, další SETCHAR seznam znovu nevytváří.
 # -----------------------------------------------------------
 class Variable:
     def __init__(self, name):
         self.name = name
         self.v_type = None
         self.value = None
+        self.parts = None
+        self.chars = None
+        self.chars_value = None
 
     # Změní u proměnné v_type a value
     def update(self, new_value, v_type):
         self.v_type = v_type
         self.value = new_value
 
+    # Připojí část na konec řetězcové hodnoty bez jejího kopírování
+    def append(self, part):
+        if "value" in self.__dict__ or self.parts is None:
+            self.parts = [self.value, part]
+            del self.value
+        else:
+            self.parts.append(part)
+
+    # Nahradí znak řetězcové hodnoty na zadané pozici v O(1)
+    def set_char(self, position, character):
+        if self.parts is not None or "value" in self.__dict__:
+            value = self.value
+            if self.chars is None or value is not self.chars_value:
+                self.chars = list(value)
+            self.parts = None
+            del self.value
+        # seznam se mění, dřívější spojený řetězec mu už neodpovídá
+        self.chars_value = None
+        self.chars[position] = character
+
+    # Vrátí hodnotu, čeká-li řetězec v seznamu znaků, vrátí přímo seznam bez spojení
+    def text(self):
+        if "value" not in self.__dict__ and self.parts is None:
+            return self.chars
+        return self.value
+
+    # Volá se jen při chybějícím atributu, tedy pro value s nespojenými částmi nebo znaky
+    def __getattr__(self, name):
+        if name != "value" or "chars" not in self.__dict__:
+            raise AttributeError(name)
+        if self.parts is not None:
+            value = "".join(self.parts)
+            self.parts = None
+        else:
+            value = "".join(self.chars)
+            self.chars_value = value
+        self.value = value
+        return value
+
 
 # -----------------------------------------------------------
 # Stack
@@ -1241,28 +2678,384 @@ class Stack:
             self.top = None
         return temp
 
-    # Vrátí vrchol zásobníku
-    def get_top(self):
-        if self.top is None:
-            exit(ERROR_54)
-        return self.top
 
-    # Vrátí vrchní dvě položky ze zásobníku
-    def get_tops(self):
-        if len(self.data) < 2:
+# -----------------------------------------------------------
+# OperandStack
+#
+# Datový zásobník zásobníkových instrukcí, typy a hodnoty položek
+# jsou v paralelních předalokovaných polích a vrchol určuje size,
+# odebrání položek ani CLEARS proto nic nepřesouvají ani nealokují
+# -----------------------------------------------------------
+class OperandStack:
+    INITIAL_CAPACITY = 64
+
+    def __init__(self):
+        self.types = [None] * self.INITIAL_CAPACITY
+        self.values = [None] * self.INITIAL_CAPACITY
+        self.size = 0
+
+    # Přidá hodnotu daného typu na vrchol, při zaplnění se pole zdvojnásobí
+    def push(self, value, v_type):
+        size = self.size
+        if size == len(self.types):
+            self.types.extend([None] * size)
+            self.values.extend([None] * size)
+        self.types[size] = v_type
+        self.values[size] = value
+        self.size = size + 1
+
+    # Vrátí index nejspodnější z count položek na vrcholu, položky zůstávají
+    # na zásobníku
+    def peek_operands(self, count):
+        i = self.size - count
+        if i < 0:
             exit(ERROR_54)
-        return self.data[len(self.data) - 2], self.data[len(self.data) - 1]
+        return i
+
+    # Odebere count položek z vrcholu a vrátí index nejspodnější z nich,
+    # odebrané položky zůstávají v polích čitelné do dalšího push
+    def pop_operands(self, count):
+        size = self.size - count
+        if size < 0:
+            exit(ERROR_56)
+        self.size = size
+        return size
 
     # Vymaže všechny data ze zásobníku
-    def clear_stack(self):
-        while self.top is not None:
-            self.pop_stack()
+    def clear(self):
+        self.size = 0
 
 
-def main():
+# -----------------------------------------------------------
+# ProgramRunner
+#
+# Vykonává programy v izolovaných instancích Interpret v rámci jednoho
+# procesu pro režimy --serve a --batch. Ukončení programu voláním
+# exit() i neočekávaná výjimka skončí jen daný běh. Dekódované
+# programy drží v LRU cache podle hashe xml, opakovaně spouštěný
+# program se tak validuje a dekóduje jen jednou.
+# -----------------------------------------------------------
+class ProgramRunner:
+    DEFAULT_CACHE_SIZE = 128
+
+    def __init__(self, cache_size):
+        self.cache_size = cache_size
+        self.programs = collections.OrderedDict()
+
+    # Vykoná program se vstupem input_data v novém interpretu. Je-li zadán
+    # seznam stats_arguments, počítají se statistiky a vypíšou se parametry
+    # ve stejném tvaru jako na příkazové řádce, limits je slovník limitů
+    # pro ResourceGovernor. Vrátí návratový kód, stdout, stderr, výpis
+    # statistik (nebo None) a použitý interpret.
+    def run(self, source, input_data, stats_arguments=None, opt=0, limits=None):
+        interpret = Interpret()
+        output = io.BytesIO()
+        errors = io.StringIO()
+        interpret.output_sink.output_file = output
+        interpret.output_sink.flush_policy = "exit"
+        stats = None
+        if stats_arguments is not None:
+            stats = io.StringIO()
+            interpret.stats_manager.stats_file = stats
+            interpret.arguments_validator.arguments = stats_arguments
+            interpret.arguments_validator.args_parser = argparse.Namespace(
+                print=[[argument.split("=", 1)[1]] for argument in stats_arguments if argument.startswith("--print=")])
+
+        exit_code = ERROR_0
+        with contextlib.redirect_stderr(errors):
+            try:
+                interpret.resource_governor.configure(limits or {})
+                self.load_program(interpret, source)
+                if opt >= 1:
+                    interpret.peephole_optimizer.optimize()
+                if opt == 2:
+                    interpret.type_inference.specialize()
+                input_text = input_data.decode("utf-8", errors="replace")
+                interpret.arguments_validator.input_reader = InputReader(io.StringIO(input_text, newline=None))
+                interpret.iterator()
+            except SystemExit as error:
+                exit_code = error.code
+            except Exception:
+                traceback.print_exc()
+                exit_code = ERROR_99
+            finally:
+                interpret.output_sink.flush()
+        return exit_code, output.getvalue(), errors.getvalue(), None if stats is None else stats.getvalue(), interpret
+
+    # Načte program do interpretu, dekódovaný program bere z LRU cache
+    def load_program(self, interpret, source):
+        key = hashlib.sha256(source).digest()
+        cached = self.programs.get(key)
+        if cached is None:
+            interpret.program_decoder.load(io.BytesIO(source))
+            cached = (interpret.program, dict(interpret.label_table), len(interpret.frame_manager.gf.slots))
+            self.programs[key] = cached
+            if len(self.programs) > self.cache_size:
+                self.programs.popitem(last=False)
+        else:
+            self.programs.move_to_end(key)
+        interpret.program = cached[0]
+        interpret.source_program = cached[0]
+        interpret.label_table = dict(cached[1])
+        interpret.frame_manager.gf = Frame(cached[2])
+
+
+# -----------------------------------------------------------
+# InterpretServer
+#
+# Režim --serve=SOCKET: dlouho běžící proces, který přijímá požadavky
+# na lokálním unixovém socketu a každý vykoná v novém Interpret.
+# Požadavek i odpověď jsou posloupnosti rámců, rámec je délka dat
+# (4 bajty, big endian) následovaná daty:
+#   požadavek: JSON s volbami, xml programu, vstup pro READ
+#   odpověď:   JSON {"exit_code", "stats"}, stdout, stderr
+# Volba "stats" je seznam parametrů statistik ve stejném tvaru jako
+# na příkazové řádce (např. "--insts", "--print=X"), volba "opt"
+# odpovídá --opt a volby "max_steps", "timeout" a "max_memory"
+# pro daný požadavek zpřísňují limity zadané při spuštění serveru.
+# Jedním spojením lze poslat více požadavků za sebou. Na požadavek
+# s neplatnými volbami server odpoví kódem 10, na selhání interpretu
+# kódem 99 a výpisem chyby na stderr, spojení zůstává otevřené.
+# Spojení obsluhuje --workers předem spuštěných procesů, každý s
+# vlastním ProgramRunner, ukončený proces server nahradí novým.
+# -----------------------------------------------------------
+class InterpretServer:
+    FRAME_HEADER = struct.Struct(">I")
+    MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, socket_path, workers, cache_size, limits):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.limits = limits
+        self.program_runner = ProgramRunner(cache_size)
+
+    # Otevře socket a spustí pracovní procesy, běží dokud není ukončen
+    def serve(self):
+        try:
+            if stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                os.remove(self.socket_path)
+        except OSError:
+            pass
+        try:
+            server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server_socket.bind(self.socket_path)
+            server_socket.listen()
+        except OSError:
+            exit(ERROR_12)
+
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=self.worker, args=(server_socket,)) for _ in range(self.workers)]
+        try:
+            for process in processes:
+                process.start()
+            while True:
+                multiprocessing.connection.wait([process.sentinel for process in processes])
+                for i, process in enumerate(processes):
+                    if not process.is_alive():
+                        process.join()
+                        processes[i] = context.Process(target=self.worker, args=(server_socket,))
+                        processes[i].start()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+        finally:
+            server_socket.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    # Smyčka pracovního procesu, přijímá a obsluhuje spojení
+    def worker(self, server_socket):
+        try:
+            while True:
+                connection, _ = server_socket.accept()
+                with connection:
+                    self.handle_connection(connection)
+        except KeyboardInterrupt:
+            pass
+
+    # Obsluhuje požadavky jednoho spojení, dokud jej klient neukončí
+    def handle_connection(self, connection):
+        while True:
+            try:
+                options = self.read_frame(connection)
+                if options is None:
+                    return
+                source = self.read_frame(connection)
+                input_data = self.read_frame(connection)
+                if source is None or input_data is None:
+                    return
+                options = json.loads(options)
+            except (OSError, ValueError):
+                return
+            try:
+                connection.sendall(self.execute(options, source, input_data))
+            except OSError:
+                return
+
+    # Přečte jeden rámec, na konci spojení vrátí None
+    def read_frame(self, connection):
+        header = self.receive(connection, self.FRAME_HEADER.size)
+        if header is None:
+            return None
+        size = self.FRAME_HEADER.unpack(header)[0]
+        if size > self.MAX_FRAME_SIZE:
+            raise ValueError("frame too large")
+        data = self.receive(connection, size)
+        if data is None:
+            raise ValueError("truncated frame")
+        return data
+
+    # Přečte přesně size bajtů, skončí-li spojení dříve, vrátí None
+    def receive(self, connection, size):
+        parts = []
+        while size > 0:
+            part = connection.recv(min(size, 1 << 20))
+            if part == b"":
+                return None
+            parts.append(part)
+            size -= len(part)
+        return b"".join(parts)
+
+    # Vrátí data zabalená do rámce
+    def frame(self, data):
+        return self.FRAME_HEADER.pack(len(data)) + data
+
+    # Vykoná jeden požadavek v novém interpretu a vrátí odpověď, chyba
+    # obsluhy požadavku pracovní proces neukončí
+    def execute(self, options, source, input_data):
+        if not self.valid_options(options):
+            return self.response(ERROR_10, None, b"", "neplatné volby požadavku\n")
+        try:
+            limits = ResourceGovernor.stricter_limits(self.limits, options)
+            exit_code, output, errors, stats, _ = self.program_runner.run(source, input_data,
+                                                                          options.get("stats") or None,
+                                                                          options.get("opt", 0), limits)
+        except Exception:
+            return self.response(ERROR_99, None, b"", traceback.format_exc())
+        return self.response(exit_code, stats, output, errors)
+
+    # Ověří, že volby jsou objekt, "stats" seznam řetězců a "opt" úroveň --opt
+    def valid_options(self, options):
+        if not isinstance(options, dict):
+            return False
+        stats = options.get("stats")
+        if stats is not None and (not isinstance(stats, list) or
+                                  not all(isinstance(argument, str) for argument in stats)):
+            return False
+        return options.get("opt", 0) in [0, 1, 2] and not isinstance(options.get("opt"), bool)
+
+    # Vrátí odpověď složenou z rámců hlavičky, stdout a stderr
+    def response(self, exit_code, stats, output, errors):
+        header = json.dumps({"exit_code": exit_code, "stats": stats})
+        return self.frame(header.encode("utf-8")) + self.frame(output) + self.frame(errors.encode("utf-8"))
+
+
+# -----------------------------------------------------------
+# BatchRunner
+#
+# Režim --batch=MANIFEST: každý neprázdný řádek manifestu je JSON
+# objekt {"source": ..., "input": ..., "expected": ...} s cestami
+# relativními k manifestu, input a expected jsou nepovinné. Klíče
+# "max_steps", "timeout" a "max_memory" pro daný případ zpřísňují
+# limity zadané na příkazové řádce, případ, který limit překročí,
+# skončí jeho návratovým kódem a ostatní případy nezdrží. Případy
+# se vykonají v --jobs procesech, každý s vlastním ProgramRunner,
+# a výsledky se průběžně v pořadí manifestu vypisují na stdout jako
+# JSONL s klíči line, source, exit_code, output_sha256,
+# output_matches, duration_ms a instructions. Úlohy předává pool
+# procesů serializované, obslužné metody jsou proto statické a
+# ProgramRunner pracovního procesu je atributem třídy.
+# -----------------------------------------------------------
+class BatchRunner:
+    program_runner = None
+    limits = None
+
+    def __init__(self, manifest_path, jobs, limits):
+        self.manifest_path = manifest_path
+        self.jobs = jobs
+        self.limits = limits
+
+    # Vykoná všechny případy manifestu a vypíše jejich výsledky
+    def run(self):
+        try:
+            manifest_file = open(self.manifest_path, "r")
+        except OSError:
+            exit(ERROR_11)
+        base_dir = os.path.dirname(os.path.abspath(self.manifest_path))
+        cases = ((i + 1, line, base_dir) for i, line in enumerate(manifest_file) if line.strip() != "")
+
+        context = multiprocessing.get_context("fork")
+        with manifest_file, context.Pool(self.jobs, initializer=BatchRunner.start_worker,
+                                         initargs=(self.limits,)) as pool:
+            for result in pool.imap(BatchRunner.run_case, cases):
+                sys.stdout.write(json.dumps(result) + "\n")
+                sys.stdout.flush()
+
+    # Připraví pracovní proces, limits jsou výchozí limity případů
+    @staticmethod
+    def start_worker(limits):
+        BatchRunner.program_runner = ProgramRunner(ProgramRunner.DEFAULT_CACHE_SIZE)
+        BatchRunner.limits = limits
+
+    # Vykoná jeden případ manifestu v pracovním procesu a vrátí jeho výsledek
+    @staticmethod
+    def run_case(case):
+        line_number, line, base_dir = case
+        result = {"line": line_number}
+        try:
+            entry = json.loads(line)
+            result["source"] = entry["source"]
+            source = BatchRunner.read_file(base_dir, entry["source"])
+            input_data = BatchRunner.read_file(base_dir, entry.get("input"))
+            expected = BatchRunner.read_file(base_dir, entry.get("expected"))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            result["error"] = "invalid manifest line"
+            return result
+        if source is None:
+            result["exit_code"] = ERROR_31
+            return result
+        if input_data is None:
+            result["exit_code"] = ERROR_11
+            return result
+
+        limits = ResourceGovernor.stricter_limits(BatchRunner.limits, entry)
+        start = time.perf_counter()
+        exit_code, output, _, _, interpret = BatchRunner.program_runner.run(source, input_data, [], 0, limits)
+        result["exit_code"] = exit_code
+        result["output_sha256"] = hashlib.sha256(output).hexdigest()
+        result["output_matches"] = None if "expected" not in entry else output == expected
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["instructions"] = interpret.stats_manager.executed_instructions()
+        return result
+
+    # Přečte soubor zadaný relativně k manifestu, chybí-li cesta, vrátí
+    # prázdná data, nelze-li soubor přečíst, vrátí None
+    @staticmethod
+    def read_file(base_dir, path):
+        if path is None:
+            return b""
+        try:
+            with open(os.path.join(base_dir, path), "rb") as data_file:
+                return data_file.read()
+        except OSError:
+            return None
+
+
+# Spustí interpret, compiled je modul přeložený --compile-to, který se
+# vykoná místo programu ze --source
+def main(compiled=None):
+    # velká čísla se převádí na text jen při výpisu, limit počtu číslic proto vypneme
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
     program = Interpret()
-    program.arguments_validator.get_arguments()
-    program.iterator()
+    program.compiled = compiled
+    try:
+        program.arguments_validator.get_arguments()
+        program.iterator()
+    finally:
+        program.output_sink.flush()
     exit(ERROR_0)
 
 
@@ -0,0 +1,56 @@
+# -----------------------------------------------------------
+# Společné pomůcky testů interpretu
+#
+# Testy spouští interpret.py jako samostatný proces nad programem
+# zapsaným v textovém tvaru IPPcode23, stejně jako jej spouští
+# uživatel, a kontrolují návratový kód, výstup a statistiky.
+# -----------------------------------------------------------
+
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+INTERPRET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "interpret.py")
+
+
+# Převede program v textovém tvaru IPPcode23 na xml, operandy se zapisují
+# jako "typ@hodnota", návěští jako "label@jméno" a typy jako "type@jméno"
+def to_xml(source):
+    program = ET.Element("program", language="IPPcode23")
+    order = 0
+    for line in source.splitlines():
+        parts = line.split()
+        if len(parts) == 0 or parts[0].upper() == ".IPPCODE23":
+            continue
+        order += 1
+        instruction = ET.SubElement(program, "instruction", order=str(order), opcode=parts[0])
+        for i, operand in enumerate(parts[1:]):
+            a_type, value = operand.split("@", 1)
+            if a_type in ["GF", "LF", "TF"]:
+                a_type, value = "var", operand
+            argument = ET.SubElement(instruction, "arg" + str(i + 1), type=a_type)
+            argument.text = value
+    return ET.tostring(program, encoding="unicode", xml_declaration=True)
+
+
+# Spustí program s parametry a vstupem, vrátí návratový kód, stdout,
+# stderr a obsah souboru statistik (nebo None, nevznikl-li)
+@pytest.fixture
+def run_program(tmp_path):
+    def run(source, *arguments, input_data=""):
+        source_path = tmp_path / "program.xml"
+        source_path.write_text(to_xml(source), encoding="utf-8")
+        input_path = tmp_path / "input.txt"
+        input_path.write_text(input_data, encoding="utf-8")
+        stats_path = tmp_path / "stats.txt"
+        if stats_path.exists():
+            stats_path.unlink()
+        arguments = [argument.replace("STATS", str(stats_path)) for argument in arguments]
+        process = subprocess.run([sys.executable, INTERPRET, "--source=" + str(source_path),
+                                  "--input=" + str(input_path)] + arguments, capture_output=True, text=True)
+        stats = stats_path.read_text() if stats_path.exists() else None
+        return process.returncode, process.stdout, process.stderr, stats
+    return run
@@ -0,0 +1,27 @@
+# -----------------------------------------------------------
+# Testy přepínačů příkazové řádky
+# -----------------------------------------------------------
+
+import subprocess
+import sys
+
+import pytest
+
+from conftest import INTERPRET
+
+
+# --help smí být jediným přepínačem, jinak se končí chybou 10
+@pytest.mark.parametrize("option", ["--stats=x", "--output=x", "--flush=line", "--opt=0", "--cache-dir=x",
+                                    "--compile-to=x", "--profile=x", "--serve=x", "--workers=2", "--serve-cache=3",
+                                    "--batch=x", "--jobs=2", "--max-steps=5", "--timeout=1", "--max-memory=5"])
+def test_help_is_exclusive(tmp_path, option):
+    process = subprocess.run([sys.executable, INTERPRET, "--help", option], capture_output=True, cwd=tmp_path)
+    assert process.returncode == 10
+    assert list(tmp_path.iterdir()) == []
+
+
+# Samotné --help vypíše nápovědu a skončí úspěchem
+def test_help_alone():
+    process = subprocess.run([sys.executable, INTERPRET, "--help"], capture_output=True, text=True)
+    assert process.returncode == 0
+    assert process.stdout.startswith("usage:")
@@ -0,0 +1,30 @@
+# -----------------------------------------------------------
+# Testy limitů ResourceGovernor
+# -----------------------------------------------------------
+
+import pytest
+
+LOOP = """.IPPcode23
+DEFVAR GF@i
+DEFVAR GF@t
+MOVE GF@i int@1
+LABEL label@loop
+MOVE GF@t GF@i
+WRITE GF@t
+PUSHS GF@i
+PUSHS int@1
+ADDS
+POPS GF@i
+CREATEFRAME
+JUMPIFNEQ label@loop GF@i int@5
+"""
+
+
+# --max-steps počítá instrukce původního programu bez návěští, program
+# se proto zastaví na stejném místě i se sloučenými instrukcemi --opt
+@pytest.mark.parametrize("opt", ["--opt=0", "--opt=1", "--opt=2"])
+@pytest.mark.parametrize("steps, output", [(6, "1"), (14, "12"), (20, "12")])
+def test_max_steps_counts_source_instructions(run_program, opt, steps, output):
+    code, stdout, stderr, stats = run_program(LOOP, "--max-steps=" + str(steps), "--stats=STATS", "--insts", opt)
+    assert (code, stdout, stats) == (60, output, str(steps))
+    assert "Vykonáno instrukcí: " + str(steps) + "\n" in stderr
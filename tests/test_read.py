@@ -0,0 +1,16 @@
+# -----------------------------------------------------------
+# Testy načítání vstupu instrukcí READ
+# -----------------------------------------------------------
+
+
+# Číslice, které nejsou desítkové (např. horní index), nejsou platné celé číslo
+def test_read_int_rejects_non_decimal_digits(run_program):
+    source = """.IPPcode23
+DEFVAR GF@a
+READ GF@a type@int
+TYPE GF@a GF@a
+WRITE GF@a
+READ GF@a type@int
+WRITE GF@a
+"""
+    assert run_program(source, input_data="²\n-12\n")[:2] == (0, "nil-12")
@@ -0,0 +1,65 @@
+# -----------------------------------------------------------
+# Testy režimu --serve
+# -----------------------------------------------------------
+
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from conftest import INTERPRET, to_xml
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+# Pošle požadavek a vrátí hlavičku odpovědi, stdout a stderr
+def request(connection, options, source):
+    for data in [options, to_xml(source).encode("utf-8"), b""]:
+        connection.sendall(FRAME_HEADER.pack(len(data)) + data)
+    frames = []
+    for _ in range(3):
+        size = FRAME_HEADER.unpack(receive(connection, FRAME_HEADER.size))[0]
+        frames.append(receive(connection, size))
+    return json.loads(frames[0]), frames[1], frames[2].decode("utf-8")
+
+
+# Přečte přesně size bajtů
+def receive(connection, size):
+    data = b""
+    while len(data) < size:
+        part = connection.recv(size - len(data))
+        assert part != b""
+        data += part
+    return data
+
+
+# Neplatné volby dostanou odpověď s kódem 10 a jediný pracovní proces
+# obsluhuje dál, ukončený pracovní proces server nahradí
+def test_invalid_options_keep_worker_alive(tmp_path):
+    socket_path = str(tmp_path / "serve.sock")
+    server = subprocess.Popen([sys.executable, INTERPRET, "--serve=" + socket_path, "--workers=1"])
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        source = ".IPPcode23\nWRITE int@42\n"
+        with socket.socket(socket.AF_UNIX) as connection:
+            connection.connect(socket_path)
+            for options in [b"[]", b'{"stats": 5}', b'{"stats": [1]}', b'{"opt": "x"}']:
+                assert request(connection, options, source)[0]["exit_code"] == 10
+            header, output, _ = request(connection, b'{"stats": ["--insts"]}', source)
+            assert (header, output) == ({"exit_code": 0, "stats": "1"}, b"42")
+            # ukončení pracovního procesu uzavře spojení, server spustí nový
+            workers = subprocess.run(["pgrep", "-P", str(server.pid)], capture_output=True, text=True)
+            os.kill(int(workers.stdout.split()[0]), signal.SIGKILL)
+        with socket.socket(socket.AF_UNIX) as connection:
+            connection.connect(socket_path)
+            assert request(connection, b"{}", source)[:2] == ({"exit_code": 0, "stats": None}, b"42")
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=10)
@@ -0,0 +1,41 @@
+# -----------------------------------------------------------
+# Testy zásobníkových instrukcí
+# -----------------------------------------------------------
+
+import pytest
+
+
+# Zásobníkové instrukce operandy ze zásobníku neodebírají, výsledek
+# přidají na vrchol, a to i po sloučení optimalizací --opt
+@pytest.mark.parametrize("opt", ["--opt=0", "--opt=1", "--opt=2"])
+def test_stack_operations_keep_operands(run_program, opt):
+    source = """.IPPcode23
+DEFVAR GF@x
+PUSHS int@1
+PUSHS int@2
+ADDS
+POPS GF@x
+WRITE GF@x
+PUSHS bool@true
+NOTS
+POPS GF@x
+WRITE GF@x
+POPS GF@x
+WRITE GF@x
+POPS GF@x
+WRITE GF@x
+POPS GF@x
+WRITE GF@x
+"""
+    assert run_program(source, opt)[:2] == (0, "3falsetrue21")
+
+
+# Chybí-li zásobníkové instrukci operandy, končí se chybou 54,
+# POPS z prázdného zásobníku končí chybou 56
+@pytest.mark.parametrize("source, code", [
+    (".IPPcode23\nPUSHS int@1\nADDS\n", 54),
+    (".IPPcode23\nNOTS\n", 54),
+    (".IPPcode23\nDEFVAR GF@x\nPOPS GF@x\n", 56),
+])
+def test_missing_stack_operands(run_program, source, code):
+    assert run_program(source)[0] == code
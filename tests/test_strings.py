@@ -0,0 +1,22 @@
+# -----------------------------------------------------------
+# Testy řetězcových instrukcí
+# -----------------------------------------------------------
+
+
+# SETCHAR nesmí znovu použít seznam znaků, který už neodpovídá řetězci
+# zkopírovanému instrukcí MOVE zpět do proměnné
+def test_setchar_after_move_of_joined_value(run_program):
+    source = """.IPPcode23
+DEFVAR GF@s
+DEFVAR GF@t
+MOVE GF@s string@abc
+SETCHAR GF@s int@0 string@x
+WRITE GF@s
+MOVE GF@t GF@s
+SETCHAR GF@s int@0 string@y
+MOVE GF@s GF@t
+SETCHAR GF@s int@1 string@z
+WRITE GF@s
+"""
+    for opt in ["--opt=0", "--opt=1", "--opt=2"]:
+        assert run_program(source, opt)[:2] == (0, "xbcxzc")
@@ -0,0 +1,71 @@
+# -----------------------------------------------------------
+# Testy statistiky --vars
+#
+# Očekávané hodnoty odpovídají původní implementaci, která počet
+# proměnných ve všech rámcích přepočítávala po každé instrukci DEFVAR.
+# -----------------------------------------------------------
+
+import pytest
+
+# Rekurzivní funkce, každé volání má v TF parametr a v LF lokální proměnnou
+RECURSION = """.IPPcode23
+DEFVAR GF@n
+MOVE GF@n int@5
+CREATEFRAME
+DEFVAR TF@depth
+MOVE TF@depth GF@n
+CALL label@count
+WRITE GF@n
+JUMP label@end
+LABEL label@count
+PUSHFRAME
+DEFVAR LF@next
+JUMPIFEQ label@done LF@depth int@0
+SUB LF@next LF@depth int@1
+CREATEFRAME
+DEFVAR TF@depth
+MOVE TF@depth LF@next
+CALL label@count
+LABEL label@done
+POPFRAME
+RETURN
+LABEL label@end
+"""
+
+# Dočasné rámce zanikají přes CREATEFRAME i POPFRAME, helper někdy vytvoří
+# větší dočasný rámec, který zanikne při návratu
+FRAMES = """.IPPcode23
+DEFVAR GF@i
+MOVE GF@i int@0
+LABEL label@loop
+CREATEFRAME
+DEFVAR TF@a
+DEFVAR TF@b
+PUSHFRAME
+CREATEFRAME
+DEFVAR TF@c
+CALL label@helper
+POPFRAME
+ADD GF@i GF@i int@1
+JUMPIFNEQ label@loop GF@i int@3
+WRITE GF@i
+JUMP label@end
+LABEL label@helper
+PUSHFRAME
+DEFVAR LF@d
+JUMPIFEQ label@skip GF@i int@2
+CREATEFRAME
+DEFVAR TF@e
+DEFVAR TF@f
+DEFVAR TF@g
+LABEL label@skip
+POPFRAME
+RETURN
+LABEL label@end
+"""
+
+
+@pytest.mark.parametrize("opt", ["--opt=0", "--opt=1", "--opt=2"])
+@pytest.mark.parametrize("source, output, max_vars", [(RECURSION, "5", "13"), (FRAMES, "3", "8")])
+def test_vars_counts_all_frames(run_program, opt, source, output, max_vars):
+    assert run_program(source, "--stats=STATS", "--vars", opt) == (0, output, "", max_vars)
@@ -0,0 +1,22 @@
+# -----------------------------------------------------------
+# Testy validace vstupního xml
+# -----------------------------------------------------------
+
+import os
+import subprocess
+import sys
+
+from conftest import INTERPRET
+
+
+# Duplicitní order se hlásí chybou 32 dříve, než se zkontrolují děti
+# instrukce, tedy i u duplicitního návěští
+def test_duplicate_order_precedes_duplicate_label(tmp_path):
+    source_path = tmp_path / "program.xml"
+    source_path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n<program language="IPPcode23">\n'
+                           ' <instruction order="1" opcode="LABEL"><arg1 type="label">a</arg1></instruction>\n'
+                           ' <instruction order="1" opcode="LABEL"><arg1 type="label">a</arg1></instruction>\n'
+                           '</program>\n', encoding="utf-8")
+    process = subprocess.run([sys.executable, INTERPRET, "--source=" + str(source_path), "--input=" + os.devnull],
+                             capture_output=True)
+    assert process.returncode == 32